@@ -1,10 +1,28 @@
 # main.py
+from src.startup import startup  # первым: отсчет холодного старта
 import sys
 from PyQt6.QtWidgets import QApplication
-from src.main_window import MainWindow
+from src.config import CAMERA_SOURCES
+
+
+def parse_sources(argv):
+    """python main.py --sources 0 1 clip.mp4 -> ["0", "1", "clip.mp4"]"""
+    if "--sources" in argv:
+        return argv[argv.index("--sources") + 1:]
+    return list(CAMERA_SOURCES)
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    w = MainWindow()
+    startup.mark("qt_app")
+    sources = parse_sources(sys.argv)
+    if len(sources) > 1 or "--sources" in sys.argv:
+        from src.multi_window import MultiStreamWindow
+        w = MultiStreamWindow(sources)
+    else:
+        from src.main_window import MainWindow
+        w = MainWindow()
+    startup.mark("window_built")
     w.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    startup.mark("window_shown")
+    sys.exit(app.exec())
@@ -0,0 +1,386 @@
+# src/benchmark.py
+"""
+Детерминированный бенчмарк покадрового конвейера (без камеры и дисплея).
+
+Проигрывает записанный поток landmarks (.npy, (N, 2, 21, 3)) и/или видео,
+замеряет каждую стадию и пишет JSON-отчет для сравнения версий.
+
+    python -m src.benchmark --out bench.json
+    python -m src.benchmark --landmarks session.npy --video clip.mp4 --out bench.json
+    python -m src.benchmark --video clip.mp4 --save-landmarks session.npy
+    python -m src.benchmark --out new.json --compare old.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+
+SEED = 1234
+
+
+def summarize(samples_ns):
+    """Список замеров (нс) -> статистика в микросекундах"""
+    a = np.asarray(samples_ns, dtype=np.float64) / 1000.0
+    if len(a) == 0:
+        return {"n": 0}
+    return {
+        "n": int(len(a)),
+        "mean_us": float(a.mean()),
+        "p50_us": float(np.percentile(a, 50)),
+        "p95_us": float(np.percentile(a, 95)),
+        "p99_us": float(np.percentile(a, 99)),
+        "min_us": float(a.min()),
+        "max_us": float(a.max()),
+    }
+
+
+def time_each(fn, items, warmup=5):
+    """Вызывает fn(item) для каждого элемента, возвращает статистику"""
+    for item in items[:warmup]:
+        fn(item)
+    samples = []
+    for item in items:
+        t0 = time.perf_counter_ns()
+        fn(item)
+        samples.append(time.perf_counter_ns() - t0)
+    return summarize(samples)
+
+
+def time_once(fn, repeat=1):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        result = fn()
+        samples.append(time.perf_counter_ns() - t0)
+    return summarize(samples), result
+
+
+def synthetic_landmarks(n_frames, seed=SEED):
+    """Детерминированный поток двух рук: шаблон кисти + случайное блуждание"""
+    rng = np.random.default_rng(seed)
+    template = rng.uniform(-0.08, 0.08, size=(21, 3))
+    template[0] = 0.0
+    centers = np.array([[0.35, 0.55, 0.0], [0.65, 0.55, 0.0]])
+    walk = np.cumsum(rng.normal(0, 0.003, size=(n_frames, 2, 3)), axis=0)
+    pts = template[None, None] + (centers[None] + walk)[:, :, None, :]
+    pts += rng.normal(0, 0.002, size=pts.shape)
+    # Иногда одна рука пропадает (нули = нет руки)
+    missing = rng.random((n_frames, 2)) < 0.1
+    pts[missing] = 0.0
+    return pts
+
+
+def synthetic_dataset(n_rows, n_classes=10, seed=SEED):
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(-1, 1, size=(n_classes, 126))
+    y_idx = rng.integers(0, n_classes, size=n_rows)
+    X = (centers[y_idx] + rng.normal(0, 0.15, size=(n_rows, 126))).astype(np.float32)
+    y = np.array([f"g{i}" for i in y_idx])
+    return X, y
+
+
+def git_revision():
+    try:
+        base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=base,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def to_hands(points):
+    """(2, 21, 3) -> HandsResult (нули = нет руки)"""
+    from src.landmarks import HandsResult
+    left = points[0] if points[0].any() else None
+    right = points[1] if points[1].any() else None
+    return HandsResult(left, right)
+
+
+# --- Стадии ---
+
+def bench_normalize(stream):
+    from src.engine import normalize_points, normalize_hands_batch
+    frames = list(stream)
+    per_frame = time_each(lambda p: (normalize_points(p[0] if p[0].any() else None),
+                                     normalize_points(p[1] if p[1].any() else None)), frames)
+    batch, _ = time_once(lambda: normalize_hands_batch(stream), repeat=5)
+    return {"normalize_hand": per_frame, "normalize_hands_batch": batch}
+
+
+def bench_predict(features, workdir):
+    from src.engine import NeuralEngine
+    from src.voting import MajorityVote
+    engine = NeuralEngine(base_dir=os.path.join(workdir, "predict"))
+    X, y = synthetic_dataset(3000)
+    engine.save_dataset(X, y)
+    engine.train()
+
+    out = {"predict": time_each(engine.predict, list(features)),
+           "predict_uncached": time_each(engine._predict_one, list(features))}
+    # Удерживаемый жест: один кадр с дрожанием меньше шага кэша
+    rng = np.random.default_rng(0)
+    held = [features[0] + rng.normal(0, 0.001, features[0].shape).astype(np.float32) for _ in range(len(features))]
+    cache = engine.predict_cache
+    cache.clear()
+    hits, misses = cache.hits, cache.misses
+    out["predict_cached_static"] = time_each(engine.predict, held)
+    out["predict_cached_static"]["hit_rate"] = (cache.hits - hits) / max(1, cache.hits - hits + cache.misses - misses)
+    labels = [engine.predict(f) for f in features]
+    votes = MajorityVote()
+    out["majority_vote"] = time_each(lambda lc: votes.push(*lc), labels)
+    if engine.model is not None:
+        model = engine.model
+        out["sklearn_predict_proba"] = time_each(lambda f: model.predict_proba(f.reshape(1, -1)),
+                                                 list(features[:200]))
+    return out
+
+
+def bench_draw(stream):
+    from src.overlay import draw_skeleton, SkeletonRenderer
+    from src.config import FRAME_WIDTH, FRAME_HEIGHT, DISPLAY_SIZE
+    canvas = np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+    hands = [to_hands(p) for p in stream]
+    out = {"draw_skeleton": time_each(lambda h: draw_skeleton(canvas, h), hands)}
+    # Воркер рисует на холсте размера панели (DisplayFrames.begin), а не на полном кадре
+    display = np.zeros((DISPLAY_SIZE[1], DISPLAY_SIZE[0], 3), dtype=np.uint8)
+    out["draw_skeleton_display"] = time_each(lambda h: draw_skeleton(display, h), hands)
+    cached = SkeletonRenderer(every=3)
+    out["overlay_every3"] = time_each(lambda h: cached.draw(display, h), hands)
+    return out
+
+
+def bench_frame_conversion(n_frames):
+    """Подготовка кадра в воркере (DisplayFrames.publish) + QPixmap в GUI"""
+    from src.display import DisplayFrames
+    from src.config import FRAME_WIDTH, FRAME_HEIGHT, DISPLAY_SIZE
+    rng = np.random.default_rng(SEED)
+    frames = [rng.integers(0, 255, (FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8) for _ in range(4)]
+    items = [frames[i % 4] for i in range(n_frames)]
+    display = DisplayFrames(*DISPLAY_SIZE)
+    out = {"display_publish": time_each(display.publish, items)}
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtGui import QGuiApplication
+        app = QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
+        from src.main_window import rgb_to_pixmap
+    except Exception as e:
+        out["rgb_to_pixmap"] = {"skipped": str(e)}
+        return out
+    display.publish(items[0])
+    rgb = display.acquire()
+    out["rgb_to_pixmap"] = time_each(lambda _: rgb_to_pixmap(rgb), items)
+    display.release()
+    return out
+
+
+def bench_preprocess(n_frames, boost=1.5):
+    """
+    Кадр камеры -> RGB для анализа + холст экрана: прежний путь (flip и яркость
+    на полном кадре, новые массивы) против буферов FramePreprocessor/DisplayFrames.
+    alloc_kb — пиковые новые выделения NumPy за кадр (tracemalloc).
+    """
+    import cv2
+    import tracemalloc
+    from src.preprocess import FramePreprocessor
+    from src.display import DisplayFrames
+    from src.config import FRAME_WIDTH, FRAME_HEIGHT, DISPLAY_SIZE, ANALYSIS_SIZE
+    rng = np.random.default_rng(SEED)
+    frames = [rng.integers(0, 255, (FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8) for _ in range(4)]
+    items = [frames[i % 4] for i in range(n_frames)]
+
+    old_display = DisplayFrames(*DISPLAY_SIZE)
+    def old_path(frame):
+        frame = cv2.convertScaleAbs(cv2.flip(frame, 1), alpha=boost, beta=10)
+        cv2.cvtColor(cv2.resize(frame, ANALYSIS_SIZE), cv2.COLOR_BGR2RGB)
+        old_display.publish(frame)
+
+    pre = FramePreprocessor()
+    display = DisplayFrames(*DISPLAY_SIZE)
+    def new_path(frame):
+        pre.process(frame, True, boost)
+        display.begin(frame, True, boost)
+        display.commit()
+
+    out = {}
+    for name, fn in (("preprocess_legacy", old_path), ("preprocess", new_path)):
+        stats = time_each(fn, items)
+        tracemalloc.start()
+        for frame in items[:20]:
+            tracemalloc.reset_peak()
+            fn(frame)
+        stats["alloc_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+        out[name] = stats
+    return out
+
+
+def bench_startup(repeat=3):
+    """Импорт окна в новом процессе: то, что видно как пустой экран при старте"""
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("import time; t = time.perf_counter(); import src.main_window; "
+            "print(time.perf_counter_ns() - int(t * 1e9))")
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    samples = []
+    for _ in range(repeat):
+        try:
+            out = subprocess.check_output([sys.executable, "-c", code], cwd=base, env=env,
+                                          stderr=subprocess.DEVNULL)
+            samples.append(int(out.decode().strip().splitlines()[-1]))
+        except Exception as e:
+            return {"import_main_window": {"skipped": str(e)}}
+    return {"import_main_window": summarize(samples)}
+
+
+def bench_video(video, save_landmarks=None, max_frames=None):
+    """Landmarks на записанном видео; заодно можно сохранить поток для replay"""
+    import cv2
+    from src.config import LANDMARK_BACKEND
+    from src.landmarks import create_backend
+    from src.preprocess import FramePreprocessor
+    backend = create_backend(LANDMARK_BACKEND)
+    pre = FramePreprocessor()
+    cap = cv2.VideoCapture(video)
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(pre.process(frame, mirror=True).copy())
+    cap.release()
+    if not frames:
+        return {"landmarks": {"skipped": f"no frames in {video}"}}, None
+
+    stream = np.zeros((len(frames), 2, 21, 3))
+    samples = []
+    for i, rgb in enumerate(frames):
+        t0 = time.perf_counter_ns()
+        hands = backend.process(rgb)
+        samples.append(time.perf_counter_ns() - t0)
+        if hands.left is not None:
+            stream[i, 0] = hands.left
+        if hands.right is not None:
+            stream[i, 1] = hands.right
+    backend.close()
+    if save_landmarks:
+        np.save(save_landmarks, stream)
+    return {f"landmarks_{LANDMARK_BACKEND}": summarize(samples)}, stream
+
+
+def bench_dataset(sizes, workdir):
+    from src.engine import NeuralEngine
+    out = {}
+    for n in sizes:
+        base = os.path.join(workdir, f"ds_{n}")
+        engine = NeuralEngine(base_dir=base)
+        X, y = synthetic_dataset(n)
+        chunk = max(1, n // 10)
+        # 10 сохранений, как 10 записей жестов подряд
+        samples = []
+        for i in range(0, n, chunk):
+            t0 = time.perf_counter_ns()
+            engine.save_dataset(X[i:i + chunk], y[i:i + chunk])
+            samples.append(time.perf_counter_ns() - t0)
+        save_stats = summarize(samples)
+        train_stats, (ok, msg) = time_once(engine.train)
+        out[str(n)] = {"save_dataset": save_stats, "train": train_stats, "train_ok": ok}
+        shutil.rmtree(base, ignore_errors=True)
+    return out
+
+
+def compare(new, old):
+    """Печатает изменение p50 по стадиям относительно старого отчета"""
+    print(f"{'stage':<28}{'old p50':>12}{'new p50':>12}{'ratio':>8}")
+    for name, stats in new["stages"].items():
+        prev = old.get("stages", {}).get(name)
+        if not prev or "p50_us" not in stats or "p50_us" not in prev:
+            continue
+        ratio = stats["p50_us"] / max(prev["p50_us"], 1e-9)
+        flag = "  <-- slower" if ratio > 1.10 else ""
+        print(f"{name:<28}{prev['p50_us']:>12.1f}{stats['p50_us']:>12.1f}{ratio:>8.2f}{flag}")
+
+
+def run(args):
+    stages = {}
+    datasets = {}
+    workdir = tempfile.mkdtemp(prefix="sign_bench_")
+    try:
+        stream = None
+        if args.video:
+            video_stats, stream = bench_video(args.video, args.save_landmarks, args.max_frames)
+            stages.update(video_stats)
+        if args.landmarks:
+            stream = np.load(args.landmarks)
+        if stream is None:
+            stream = synthetic_landmarks(args.frames)
+
+        from src.engine import normalize_hands_batch
+        features = normalize_hands_batch(stream)
+        features = features[features.any(axis=1)]
+
+        stages.update(bench_normalize(stream))
+        stages.update(bench_predict(features, workdir))
+        stages.update(bench_draw(stream))
+        stages.update(bench_frame_conversion(min(len(stream), 300)))
+        stages.update(bench_preprocess(min(len(stream), 300)))
+        stages.update(bench_startup())
+        if args.sizes:
+            datasets = bench_dataset([int(s) for s in args.sizes.split(",")], workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "frames": int(len(stream)),
+            "source": args.landmarks or args.video or f"synthetic(seed={SEED})",
+        },
+        "stages": stages,
+        "datasets": datasets,
+    }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-frame pipeline benchmark")
+    parser.add_argument("--landmarks", help="Recorded landmark stream .npy (N, 2, 21, 3)")
+    parser.add_argument("--video", help="Recorded video to replay through the landmark backend")
+    parser.add_argument("--save-landmarks", help="Save the landmark stream extracted from --video")
+    parser.add_argument("--max-frames", type=int, default=None, help="Limit frames read from --video")
+    parser.add_argument("--frames", type=int, default=1000, help="Synthetic stream length")
+    parser.add_argument("--sizes", default="1000,5000,20000", help="Dataset sizes for save/train ('' to skip)")
+    parser.add_argument("--out", default="bench_report.json", help="JSON report path")
+    parser.add_argument("--compare", help="Previous JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[BENCH] Report written to {args.out}")
+
+    for name, stats in report["stages"].items():
+        if "p50_us" in stats:
+            print(f"  {name:<28} p50 {stats['p50_us']:>10.1f} us   p99 {stats['p99_us']:>10.1f} us")
+    for n, stats in report["datasets"].items():
+        print(f"  dataset {n:>8}: save p50 {stats['save_dataset']['p50_us'] / 1000:.1f} ms, "
+              f"train {stats['train']['mean_us'] / 1e6:.2f} s")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
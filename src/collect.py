@@ -0,0 +1,183 @@
+# src/collect.py
+import os
+import re
+import time
+import threading
+import numpy as np
+from src.config import COLLECT_CHUNK_ROWS
+
+CHUNK_RE = re.compile(r"chunk_(\d+)\.X\.npy$")
+
+
+def _atomic_save_npy(path, arr):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+class CollectBuffer:
+    """
+    Буфер записи жестов (режим COLLECT).
+    - Признаки — в заранее выделенном float32 (chunk_rows, width),
+      метки — int16-коды + таблица меток, время кадра — float64:
+      без Python-списков на кадр.
+    - append() из потока видео и save_to() из GUI защищены одной блокировкой.
+    - Заполненный блок уходит на диск (spool_dir/chunk_XXXXXX) в фоновом
+      потоке: память ограничена одним блоком при любой длине записи,
+      а при падении программы записанное не теряется — recover()
+      при следующем запуске.
+    Без spool_dir буфер просто растет (удвоением).
+    """
+    def __init__(self, spool_dir=None, width=126, chunk_rows=COLLECT_CHUNK_ROWS):
+        self.spool_dir = spool_dir
+        self.width = width
+        self.chunk_rows = max(1, int(chunk_rows))
+        self._lock = threading.Lock()
+        self._X = np.empty((self.chunk_rows, width), dtype=np.float32)
+        self._codes = np.empty(self.chunk_rows, dtype=np.int16)
+        self._times = np.empty(self.chunk_rows, dtype=np.float64)
+        self._n = 0
+        self._labels = []      # код -> метка
+        self._label_code = {}  # метка -> код
+        self._spooled = 0      # строк в файлах этой записи
+        self._writer = None
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+
+    def append(self, features, label):
+        """Один кадр (поток видео). Возвращает число строк в буфере и на диске"""
+        with self._lock:
+            code = self._label_code.get(label)
+            if code is None:
+                code = self._label_code[label] = len(self._labels)
+                self._labels.append(label)
+            if self._n == len(self._X):
+                if self.spool_dir:
+                    self._spool_locked(background=True)
+                else:
+                    self._grow_locked()
+            self._X[self._n] = features
+            self._codes[self._n] = code
+            self._times[self._n] = time.time()
+            self._n += 1
+            return self._spooled + self._n
+
+    def __len__(self):
+        with self._lock:
+            return self._spooled + self._n
+
+    def save_to(self, engine):
+        """
+        Передача записанного в датасет (GUI). Хвост сначала тоже пишется
+        на диск, файлы удаляются только после успешного save_dataset.
+        """
+        with self._lock:
+            if not self.spool_dir:
+                X, y, t = self._take_locked()
+                return engine.save_dataset(X, y, timestamps=t) if len(X) else 0
+            self._spool_locked(background=False)
+            self._spooled = 0
+            chunks = self._chunks()  # запись может продолжаться: берем только готовые блоки
+        X, y, t, paths = self.read_spool(chunks)
+        count = engine.save_dataset(X, y, timestamps=t) if len(X) else 0
+        self._remove(paths)
+        return count
+
+    def recover(self, engine):
+        """Записи, не сохраненные из-за падения, -> датасет. Возвращает число строк"""
+        if not self.spool_dir:
+            return 0
+        X, y, t, paths = self.read_spool()
+        count = engine.save_dataset(X, y, timestamps=t) if len(X) else 0
+        self._remove(paths)
+        return count
+
+    def discard(self):
+        """Забыть несохраненную запись (память и блоки на диске)"""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.join()
+                self._writer = None
+            self._n = 0
+            self._spooled = 0
+            if self.spool_dir and os.path.isdir(self.spool_dir):
+                for _, x_path in self._chunks():
+                    base = x_path[:-len(".X.npy")]
+                    self._remove([x_path, base + ".y.npy", base + ".t.npy"])
+
+    def read_spool(self, chunks=None):
+        """-> (X, y, время, пути) блоков на диске (по умолчанию всех) по порядку записи"""
+        X_parts, y_parts, t_parts, paths = [], [], [], []
+        if chunks is None and self.spool_dir and os.path.isdir(self.spool_dir):
+            chunks = self._chunks()
+        if chunks:
+            for num, x_path in sorted(chunks):
+                base = x_path[:-len(".X.npy")]
+                try:
+                    X, y, t = np.load(x_path), np.load(base + ".y.npy"), np.load(base + ".t.npy")
+                except (OSError, ValueError):
+                    continue  # недописанный блок (падение во время записи)
+                X_parts.append(X)
+                y_parts.append(y)
+                t_parts.append(t)
+                paths += [x_path, base + ".y.npy", base + ".t.npy"]
+        if not X_parts:
+            return (np.zeros((0, self.width), dtype=np.float32), np.zeros(0, dtype=str),
+                    np.zeros(0, dtype=np.float64), paths)
+        return np.concatenate(X_parts), np.concatenate(y_parts), np.concatenate(t_parts), paths
+
+    # --- Служебное ---
+    def _take_locked(self):
+        X = self._X[:self._n].copy()
+        y = np.array(self._labels, dtype=str)[self._codes[:self._n]] if self._n else np.zeros(0, dtype=str)
+        t = self._times[:self._n].copy()
+        self._n = 0
+        return X, y, t
+
+    def _grow_locked(self):
+        self._X = np.concatenate((self._X, np.empty_like(self._X)))
+        self._codes = np.concatenate((self._codes, np.empty_like(self._codes)))
+        self._times = np.concatenate((self._times, np.empty_like(self._times)))
+
+    def _spool_locked(self, background):
+        """Текущий блок -> файл. Буфер переиспользуется, на диск уходит копия"""
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        if self._n == 0:
+            return
+        self._spooled += self._n
+        X, y, t = self._take_locked()
+        path = os.path.join(self.spool_dir, f"chunk_{self._next_chunk():06d}")
+        if background:
+            self._writer = threading.Thread(target=self._write, args=(path, X, y, t), name="collect-spool", daemon=True)
+            self._writer.start()
+        else:
+            self._write(path, X, y, t)
+
+    @staticmethod
+    def _write(path, X, y, t):
+        # .X.npy пишется последним: по нему блок и находится при чтении
+        _atomic_save_npy(path + ".y.npy", y)
+        _atomic_save_npy(path + ".t.npy", t)
+        _atomic_save_npy(path + ".X.npy", X)
+
+    def _chunks(self):
+        found = []
+        for fname in os.listdir(self.spool_dir):
+            m = CHUNK_RE.match(fname)
+            if m:
+                found.append((int(m.group(1)), os.path.join(self.spool_dir, fname)))
+        return found
+
+    def _next_chunk(self):
+        return max((num for num, _ in self._chunks()), default=0) + 1
+
+    @staticmethod
+    def _remove(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
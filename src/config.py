@@ -1,11 +1,81 @@
 # src/config.py
-import cv2
+import os
 
 # --- НАСТРОЙКИ СИСТЕМЫ ---
 CAMERA_ID = 0  # 0 для вебки, 1 для внешней
 FRAME_WIDTH = 1280
 FRAME_HEIGHT = 720
 FPS_LIMIT = 60
+DISPLAY_SIZE = (850, 600)  # Размер видео-панели: воркер готовит кадр сразу под него
+ANALYSIS_SIZE = (640, 360)  # Кадр для landmarks (меньше = быстрее, но хуже мелкие руки)
+OVERLAY_EVERY = 1  # Скелет перерисовывается раз в N кадров (между ними — копия, дешевле при N >= 3)
+
+# --- НЕСКОЛЬКО КАМЕР ---
+# Индексы камер и/или пути к видео (видео крутится по кругу вместо камеры).
+# Больше одного источника -> окно-сетка с общей моделью (или python main.py --sources 0 1 clip.mp4)
+CAMERA_SOURCES = [CAMERA_ID]
+MULTI_LANDMARK_WORKERS = 0       # Потоков landmarks на все камеры (0 = по числу ядер, не больше камер)
+MULTI_GRID_SIZE = (1240, 760)    # Размер сетки видео в окне нескольких камер
+
+# --- LANDMARKS ---
+LANDMARK_BACKEND = "holistic"  # "holistic" или "hands" (только руки, быстрее)
+KEYFRAME_INTERVAL_MAX = 1      # >1: модель раз в N кадров, между ними оптический поток
+TRACK_MIN_CONFIDENCE = 0.8     # Ниже этой доли отслеженных точек — внеплановый ключевой кадр
+
+# --- АДАПТИВНОЕ КАЧЕСТВО ---
+# Воркер держит бюджет кадра, переключая ступени: размер кадра анализа,
+# сложность модели landmarks и потолок интервала ключевых кадров (skip).
+QUALITY_ADAPTIVE = True
+QUALITY_TARGET_FPS = 30         # Бюджет анализа кадра = 1000 / FPS мс
+QUALITY_TARGET_LATENCY_MS = 0   # Потолок задержки end-to-end (0 = не следить)
+QUALITY_LEVELS = [              # От лучшей к самой легкой
+    {"size": (960, 540), "complexity": 1, "skip": 1},
+    {"size": (640, 360), "complexity": 1, "skip": 1},
+    {"size": (640, 360), "complexity": 0, "skip": 1},
+    {"size": (480, 270), "complexity": 0, "skip": 1},
+    {"size": (480, 270), "complexity": 0, "skip": 2},
+    {"size": (320, 180), "complexity": 0, "skip": 3},
+]
+QUALITY_START_LEVEL = 2         # = ANALYSIS_SIZE, модель 0, без пропусков
+
+# --- ДИНАМИЧЕСКИЕ ЖЕСТЫ ---
+SEQUENCE_MODE = False  # Распознавание по окну кадров вместо одного кадра
+SEQ_WINDOW = 15        # Длина окна (кадров)
+
+# --- КЭШ ПРЕДСКАЗАНИЙ ---
+# Пока жест держат, кадры почти не меняются: признаки округляются до шага
+# и одинаковые ячейки берутся из LRU-кэша без запуска модели
+PREDICT_CACHE_SIZE = 256     # Ячеек (0 = выключен)
+PREDICT_CACHE_STEP = 0.01    # Шаг округления признаков (доля размера руки)
+PREDICT_CACHE_MIN_HIT = 0.2  # Ниже (скользящая доля попаданий) — только дешевая проверка якоря, без LRU
+
+# --- ТЕЛЕМЕТРИЯ ---
+TELEMETRY_DIR = "logs"       # telemetry.jsonl / trace.jsonl (с ротацией)
+TELEMETRY_EXPORT_SEC = 10    # Период автоматического снимка в файл
+
+# --- HEADLESS СЕРВЕР ---
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_BATCH_MAX = 64      # Максимум запросов в одном пакете
+SERVER_MAX_WAIT_MS = 2.0   # Сколько пакет ждет попутчиков (задержка <-> пропускная способность)
+
+# --- ДАТАСЕТ ---
+DATASET_KEEP_BACKUPS = 10  # Сколько снимков хранить в data/backups
+DATASET_COMPACT_AT = 32    # Слить сегменты, когда их станет столько
+DATASET_FEATURE_DTYPE = "float32"  # "int8" — в 4 раза меньше на диске (шаг 1/127), чтение с копией
+RETRAIN_DELAY_MS = 5000    # Переобучение после серии удалений (мс тишины)
+DEDUP_RADIUS = 0.02        # Обучение по кадру: кадр пропускается, если ближе (RMS на признак) к недавнему взятому; 0 = все
+DEDUP_MEMORY = 64          # Со сколькими последними взятыми кадрами жеста сравнивать
+PROTO_PER_LABEL = 32       # Прототипов на жест: новые жесты распознаются по ним сразу после сохранения
+PROTO_K = 5                # Соседей в голосовании прототипов
+COLLECT_CHUNK_ROWS = 2048  # Кадров записи в памяти; больше — блоками на диск до нажатия "Сохранить"
+COLLECT_SPOOL_DIR = os.path.join("data", "collect")  # Несохраненная запись (восстанавливается после падения)
+
+# --- ОБУЧЕНИЕ ---
+TRAIN_N_JOBS = max(1, (os.cpu_count() or 2) - 2)  # Ядра для обучения (остальные — видео)
+TRAIN_CHUNK_TREES = 10     # Деревьев за шаг (прогресс и отмена между шагами)
+TRAIN_N_ESTIMATORS = 100   # Параметры леса (подбор: python -m src.evaluate)
+TRAIN_MAX_DEPTH = 20
 
 # --- ПАЛИТРА ИНТЕРФЕЙСА (CYBERPUNK) ---
 COLORS = {
@@ -32,13 +102,20 @@ TRANSLATIONS = {
         "btn_save": "💾 СОХРАНИТЬ БАЗУ",
         "btn_train": "🧠 ОБУЧИТЬ НЕЙРОСЕТЬ",
         "status_ready": "СИСТЕМА ГОТОВА",
+        "status_warmup": "ПРОГРЕВ МОДЕЛИ...",
         "status_rec": "ИДЕТ ЗАПИСЬ КАДРОВ...",
         "status_train": "ОБУЧЕНИЕ МОДЕЛИ...",
+        "btn_train_cancel": "✖ ОТМЕНИТЬ ОБУЧЕНИЕ",
         "msg_saved": "Датасет успешно сохранен!",
-        "msg_train_ok": "Модель обучена! Точность: Высокая",
         "msg_train_fail": "Ошибка обучения (мало данных)",
         "lbl_mirror": "Зеркальный режим камеры",
+        "lbl_sequence": "Динамические жесты (окно кадров)",
         "lbl_lang": "Язык интерфейса / Тіл:",
+        "lbl_telemetry": "ТЕЛЕМЕТРИЯ (задержки по стадиям):",
+        "lbl_quality": "Качество",
+        "lbl_trace": "Подробная трассировка каждого кадра",
+        "btn_export": "📤 ЭКСПОРТ В ФАЙЛ",
+        "grp_streams": "📹 КАМЕРЫ",
         "log_start": ">> Система инициализирована...",
         "mode_col": "РЕЖИМ: СБОР ДАННЫХ",
         "mode_pred": "РЕЖИМ: РАСПОЗНАВАНИЕ"
@@ -55,13 +132,20 @@ TRANSLATIONS = {
         "btn_save": "💾 БАЗАНЫ САҚТАУ",
         "btn_train": "🧠 НЕЙРОЖЕЛІНІ ОҚЫТУ",
         "status_ready": "ЖҮЙЕ ДАЙЫН",
+        "status_warmup": "ЖҮЙЕ ІСКЕ ҚОСЫЛУДА...",
         "status_rec": "КАДРЛАР ЖАЗЫЛУДА...",
         "status_train": "МОДЕЛЬ ОҚЫТЫЛУДА...",
+        "btn_train_cancel": "✖ ОҚЫТУДЫ ТОҚТАТУ",
         "msg_saved": "Дерекқор сәтті сақталды!",
-        "msg_train_ok": "Модель оқытылды! Дәлдік: Жоғары",
         "msg_train_fail": "Оқыту қатесі (деректер аз)",
         "lbl_mirror": "Камераны айнадай көрсету",
+        "lbl_sequence": "Динамикалық ишараттар (кадр терезесі)",
         "lbl_lang": "Тілді таңдау:",
+        "lbl_telemetry": "ТЕЛЕМЕТРИЯ (кезеңдер кідірісі):",
+        "lbl_quality": "Сапа",
+        "lbl_trace": "Әр кадрдың толық трассасы",
+        "btn_export": "📤 ФАЙЛҒА ЭКСПОРТ",
+        "grp_streams": "📹 КАМЕРАЛАР",
         "log_start": ">> Жүйе іске қосылды...",
         "mode_col": "РЕЖИМ: ДЕРЕК ЖИНАУ",
         "mode_pred": "РЕЖИМ: ТАНУ"
@@ -78,13 +162,20 @@ TRANSLATIONS = {
         "btn_save": "💾 SAVE DATABASE",
         "btn_train": "🧠 TRAIN NEURAL NET",
         "status_ready": "SYSTEM READY",
+        "status_warmup": "WARMING UP...",
         "status_rec": "RECORDING FRAMES...",
         "status_train": "TRAINING MODEL...",
+        "btn_train_cancel": "✖ CANCEL TRAINING",
         "msg_saved": "Database saved successfully!",
-        "msg_train_ok": "Model trained! Accuracy: High",
         "msg_train_fail": "Training error (insufficient data)",
         "lbl_mirror": "Mirror Camera Mode",
+        "lbl_sequence": "Dynamic Gestures (frame window)",
         "lbl_lang": "Interface Language:",
+        "lbl_telemetry": "TELEMETRY (per-stage latency):",
+        "lbl_quality": "Quality",
+        "lbl_trace": "Detailed per-frame trace",
+        "btn_export": "📤 EXPORT TO FILE",
+        "grp_streams": "📹 CAMERAS",
         "log_start": ">> System initialized...",
         "mode_col": "MODE: DATA COLLECTION",
         "mode_pred": "MODE: PREDICTION"
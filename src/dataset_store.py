@@ -0,0 +1,451 @@
+# src/dataset_store.py
+import os
+import json
+import hashlib
+import time
+import shutil
+import threading
+import numpy as np
+from datetime import datetime
+
+MANIFEST = "manifest.json"
+STORE_VERSION = 2
+SEGMENT_FILES = (".X.npy", ".y.npy", ".meta.npy")
+# Метаданные строки: сессия записи (непрерывный участок одной метки) и время кадра
+ROW_META = np.dtype([("session", "<i4"), ("time", "<f8")])
+QUANT_SCALE = 127.0  # int8-признаки: x * 127 (нормализованные координаты лежат в [-1, 1])
+
+
+def _label_runs(y):
+    """Индекс сегмента: {label: [[start, stop], ...]} по непрерывным участкам"""
+    y = np.asarray(y)
+    runs = {}
+    if len(y) == 0:
+        return runs
+    change = np.flatnonzero(y[1:] != y[:-1]) + 1
+    starts = np.concatenate(([0], change))
+    stops = np.concatenate((change, [len(y)]))
+    for a, b in zip(starts, stops):
+        runs.setdefault(str(y[a]), []).append([int(a), int(b)])
+    return runs
+
+
+def _atomic_save_npy(path, arr):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def _atomic_save_json(path, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+class DatasetStore:
+    """
+    Append-only хранилище датасета из сегментов.
+    - Каждое сохранение пишет один новый сегмент (seg_XXXXXX.X.npy / .y.npy),
+      старые файлы не переписываются.
+    - Чтение идет через np.load(mmap_mode='r') по каждому сегменту.
+    - compact() сливает сегменты в один и физически убирает удаленные строки.
+    - Индекс меток: для каждого сегмента {label: [[start, stop], ...]}.
+    - Удаление жеста = надгробие (tombstone) {label: id последнего сегмента}:
+      строки этой метки в сегментах с id <= tombstone не видны при чтении.
+      Новые записи того же жеста после удаления остаются видимыми.
+    - Бэкап = снимок манифеста + жесткие ссылки на (неизменяемые) сегменты,
+      хранится не больше keep_backups снимков.
+    Папка бэкапа сама является валидным хранилищем: DatasetStore(<snapshot>).
+    - Чтение (iter_segments, iter_label_runs, load) идет по снимку списка
+      сегментов; файлы, замененные compact()/rewrite() во время чтения
+      (сохранение во время обучения), удаляются, когда читатель закончит.
+
+    Схема v2 (сегмент — три .npy, все читаются через mmap без pickle):
+    - X: float32 (или int8, x * 127 — в 4 раза меньше, feature_dtype="int8");
+    - y: int16-коды, таблица меток — в манифесте (label_table);
+    - meta: ROW_META (session, time) на каждую строку.
+    Хранилище v1 (X как записан, y строками) переводится в v2 при открытии.
+    """
+    def __init__(self, root, legacy_file=None, backup_dir=None, keep_backups=10, feature_dtype="float32"):
+        self.root = root
+        self.backup_dir = backup_dir
+        self.keep_backups = keep_backups
+        self.feature_dtype = np.dtype(feature_dtype)
+        if self.feature_dtype not in (np.float32, np.int8):
+            raise ValueError(f"feature_dtype must be float32 or int8, got {feature_dtype}")
+        self._lock = threading.RLock()
+        self._readers = 0
+        self._doomed = []  # Замененные сегменты, которые еще читают (или не удалось удалить)
+        os.makedirs(self.root, exist_ok=True)
+
+        self.manifest_path = os.path.join(self.root, MANIFEST)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"version": STORE_VERSION, "next_id": 1, "segments": [], "tombstones": {},
+                             "label_table": [], "next_session": 1}
+            if legacy_file and os.path.exists(legacy_file):
+                self._import_legacy(legacy_file)
+        self.manifest.setdefault("tombstones", {})
+        self._counts = None
+        self._table = None
+        self._index_old_segments()
+        if self.manifest.get("version", 1) < STORE_VERSION:
+            self._migrate_v1()
+
+    # --- Запись ---
+    def append(self, X, y, timestamps=None, sessions=None, meta=None):
+        """
+        Добавляет строки одним новым сегментом. Возвращает число строк.
+        timestamps — время кадров (по умолчанию сейчас); sessions — свои
+        номера сессий на строку (например, видео-файл), по умолчанию
+        сессия = участок одной метки; meta (ROW_META) передается при
+        перезаписи, чтобы сохранить сессии и время.
+        """
+        X = np.asarray(X)
+        y = np.asarray(y).astype(str)
+        if len(X) == 0:
+            return 0
+        if len(X) != len(y):
+            raise ValueError(f"X/y length mismatch: {len(X)} != {len(y)}")
+
+        with self._lock:
+            if meta is None:
+                meta = np.empty(len(X), dtype=ROW_META)
+                meta["session"] = self._new_sessions(y if sessions is None else np.asarray(sessions))
+                meta["time"] = time.time() if timestamps is None else timestamps
+            seg_id = self.manifest["next_id"]
+            name = f"seg_{seg_id:06d}"
+            self._write_segment(name, X, y, meta)
+
+            self.manifest["next_id"] = seg_id + 1
+            self.manifest["segments"].append({"id": seg_id, "name": name, "rows": int(len(X)),
+                                              "dtype": self.feature_dtype.name, "labels": _label_runs(y)})
+            self._counts = None
+            self._write_manifest()
+        return len(X)
+
+    def delete_label(self, label):
+        """
+        O(1) удаление: ставит надгробие, данные не переписываются.
+        Возвращает число скрытых строк.
+        """
+        with self._lock:
+            removed = self.label_counts().get(label, 0)
+            if removed == 0:
+                return 0
+            self.manifest["tombstones"][label] = self.manifest["next_id"] - 1
+            self._counts = None
+            self._write_manifest()
+            return removed
+
+    def rewrite(self, X, y, meta=None):
+        """Заменяет все содержимое одним сегментом (пустые X/y -> пустое хранилище)."""
+        with self._lock:
+            old = list(self.manifest["segments"])
+            self.manifest["segments"] = []
+            self.manifest["tombstones"] = {}
+            self._counts = None
+            if len(X):
+                self.append(X, y, meta=meta)
+            else:
+                self._write_manifest()
+            self._delete_segment_files(old)
+
+    def filter_rows(self, keep):
+        """
+        Оставляет строки по bool-маске (в порядке load()), сегменты и их
+        порядок сохраняются — сессии записи не склеиваются.
+        Возвращает число удаленных строк.
+        """
+        keep = np.asarray(keep, dtype=bool)
+        with self._lock:
+            parts = []
+            pos = 0
+            for _, X, y, meta in self.iter_segments(with_meta=True):
+                mask = keep[pos:pos + len(X)]
+                pos += len(X)
+                parts.append((X[mask], y[mask], meta[mask]))
+            if pos != len(keep):
+                raise ValueError(f"Mask length {len(keep)} != {pos} rows")
+
+            old = list(self.manifest["segments"])
+            self.manifest["segments"] = []
+            self.manifest["tombstones"] = {}
+            self._counts = None
+            for X, y, meta in parts:
+                self.append(X, y, meta=meta)
+            self._write_manifest()
+            self._delete_segment_files(old)
+            return int(len(keep) - keep.sum())
+
+    def compact(self):
+        """Сливает все сегменты в один. Возвращает число сегментов до слияния."""
+        with self._lock:
+            n = len(self.manifest["segments"])
+            if n > 1 or self.manifest["tombstones"]:
+                X, y, meta = self.load(with_meta=True)
+                self.rewrite(X, y, meta)
+            return n
+
+    # --- Чтение ---
+    def iter_segments(self, with_meta=False):
+        """
+        Генератор (seg, X, y) с memory-mapped массивами (with_meta: + ROW_META).
+        y — метки-строки из кодов. Если в сегменте есть удаленные строки,
+        отдаются только живые (копия).
+        """
+        with self._lock:
+            segments = list(self.manifest["segments"])
+            tombstones = dict(self.manifest["tombstones"])
+            table = self._label_table()
+            self._readers += 1
+        try:
+            for seg in segments:
+                X = self._load_X(seg)
+                y = table[np.load(os.path.join(self.root, seg["name"] + ".y.npy"), mmap_mode="r")]
+                keep = self._keep_mask(seg, tombstones)
+                if with_meta:
+                    meta = np.load(os.path.join(self.root, seg["name"] + ".meta.npy"), mmap_mode="r")
+                    if keep is not None:
+                        X, y, meta = X[keep], y[keep], meta[keep]
+                    yield seg, X, y, meta
+                else:
+                    if keep is not None:
+                        X, y = X[keep], y[keep]
+                    yield seg, X, y
+        finally:
+            self._release_reader()
+
+    def iter_label_runs(self):
+        """
+        Генератор (label, X) по живым записанным сессиям: непрерывный участок
+        одной метки делится по ROW_META["session"], поэтому записи одного жеста
+        подряд (после compact или ingest нескольких клипов) не склеиваются.
+        X — memory-mapped срез сегмента.
+        """
+        with self._lock:
+            segments = list(self.manifest["segments"])
+            tombstones = dict(self.manifest["tombstones"])
+            self._readers += 1
+        try:
+            for seg in segments:
+                X = self._load_X(seg)
+                sessions = np.load(os.path.join(self.root, seg["name"] + ".meta.npy"), mmap_mode="r")["session"]
+                for label, runs in seg["labels"].items():
+                    if seg["id"] <= tombstones.get(label, 0):
+                        continue
+                    for a, b in runs:
+                        cuts = np.flatnonzero(sessions[a + 1:b] != sessions[a:b - 1]) + a + 1
+                        for start, stop in zip(np.concatenate(([a], cuts)), np.concatenate((cuts, [b]))):
+                            yield label, X[start:stop]
+        finally:
+            self._release_reader()
+
+    def label_counts(self):
+        """{label: число живых строк} по индексу, без чтения данных"""
+        with self._lock:
+            if self._counts is None:
+                tombstones = self.manifest["tombstones"]
+                counts = {}
+                for seg in self.manifest["segments"]:
+                    for label, runs in seg["labels"].items():
+                        if seg["id"] <= tombstones.get(label, 0):
+                            continue
+                        counts[label] = counts.get(label, 0) + sum(b - a for a, b in runs)
+                self._counts = counts
+            return dict(self._counts)
+
+    def load(self, with_meta=False):
+        """Склеенные X (float32), y всех сегментов (одна копия в памяти); with_meta: + ROW_META"""
+        parts = list(self.iter_segments(with_meta))
+        if not parts:
+            empty = (np.zeros((0, 0), dtype=np.float32), np.zeros((0,), dtype=str))
+            return empty + (np.zeros(0, dtype=ROW_META),) if with_meta else empty
+        return tuple(np.concatenate([p[i] for p in parts]) for i in range(1, len(parts[0])))
+
+    def __len__(self):
+        return sum(self.label_counts().values())
+
+    def fingerprint(self):
+        """
+        Отпечаток содержимого: сегменты неизменяемы, поэтому достаточно
+        манифеста — версии схемы, сегментов (id, строки, тип X),
+        надгробий и таблицы меток. Любая запись, удаление, compact или
+        миграция дают новый отпечаток.
+        """
+        with self._lock:
+            state = {"version": self.manifest.get("version", 1),
+                     "segments": [(s["id"], s["rows"], s.get("dtype")) for s in self.manifest["segments"]],
+                     "tombstones": self.manifest["tombstones"],
+                     "label_table": self.manifest.get("label_table", [])}
+        return hashlib.sha1(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def segment_count(self):
+        return len(self.manifest["segments"])
+
+    # --- Бэкапы ---
+    def backup(self):
+        """Дешевый снимок: копия манифеста + жесткие ссылки на сегменты"""
+        if not self.backup_dir:
+            return None
+        with self._lock:
+            if not self.manifest["segments"]:
+                return None
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            snap = os.path.join(self.backup_dir, f"snapshot_{timestamp}")
+            os.makedirs(snap, exist_ok=True)
+            for seg in self.manifest["segments"]:
+                for suffix in SEGMENT_FILES:
+                    src = os.path.join(self.root, seg["name"] + suffix)
+                    dst = os.path.join(snap, seg["name"] + suffix)
+                    if not os.path.exists(src):
+                        continue
+                    try:
+                        os.link(src, dst)
+                    except OSError:
+                        shutil.copy2(src, dst)
+            _atomic_save_json(os.path.join(snap, MANIFEST), self.manifest)
+            self._apply_retention()
+            return snap
+
+    def _apply_retention(self):
+        snaps = sorted(d for d in os.listdir(self.backup_dir) if d.startswith("snapshot_"))
+        for old in snaps[:max(0, len(snaps) - self.keep_backups)]:
+            shutil.rmtree(os.path.join(self.backup_dir, old), ignore_errors=True)
+
+    # --- Схема ---
+    def _label_table(self):
+        """Массив меток по кодам (кэш, под _lock)"""
+        if self._table is None or len(self._table) != len(self.manifest["label_table"]):
+            self._table = np.array(self.manifest["label_table"], dtype=str)
+        return self._table
+
+    def _encode_labels(self, y):
+        """Строки -> int16-коды, новые метки дописываются в таблицу (под _lock)"""
+        table = self.manifest["label_table"]
+        index = {label: i for i, label in enumerate(table)}
+        uniq, inverse = np.unique(y, return_inverse=True)
+        codes = []
+        for label in uniq.tolist():
+            if label not in index:
+                if len(table) > np.iinfo(np.int16).max:
+                    raise ValueError("Too many labels for int16 codes")
+                index[label] = len(table)
+                table.append(label)
+            codes.append(index[label])
+        return np.asarray(codes, dtype=np.int16)[inverse]
+
+    def _new_sessions(self, keys):
+        """Номер сессии на строку: каждый непрерывный участок одного ключа (метки) — новая сессия"""
+        run_id = np.concatenate(([0], np.cumsum(keys[1:] != keys[:-1])))
+        first = self.manifest.get("next_session", 1)
+        self.manifest["next_session"] = first + int(run_id[-1]) + 1
+        return (first + run_id).astype(np.int32)
+
+    def _encode_features(self, X):
+        if self.feature_dtype == np.int8:
+            return np.clip(np.rint(np.asarray(X, dtype=np.float32) * QUANT_SCALE), -127, 127).astype(np.int8)
+        return np.asarray(X, dtype=np.float32)
+
+    def _write_segment(self, name, X, y, meta):
+        """Файлы сегмента; .X.npy последним (по нему сегмент и читается)"""
+        path = os.path.join(self.root, name)
+        _atomic_save_npy(path + ".y.npy", self._encode_labels(y))
+        _atomic_save_npy(path + ".meta.npy", np.asarray(meta, dtype=ROW_META))
+        _atomic_save_npy(path + ".X.npy", self._encode_features(X))
+
+    def _load_X(self, seg):
+        """mmap признаков сегмента; int8 разворачивается в float32 (копия)"""
+        X = np.load(os.path.join(self.root, seg["name"] + ".X.npy"), mmap_mode="r")
+        if X.dtype == np.int8:
+            return X.astype(np.float32) * np.float32(1.0 / QUANT_SCALE)
+        return X
+
+    def _migrate_v1(self):
+        """
+        Разовый перевод v1 -> v2: X -> float32/int8, y -> коды, сессии по
+        участкам меток, время = время файла сегмента. Перед этим — бэкап
+        (жесткие ссылки на старые файлы; новые файлы пишутся через os.replace).
+        """
+        with self._lock:
+            self.backup()
+            self.manifest.setdefault("label_table", [])
+            self.manifest.setdefault("next_session", 1)
+            rows = 0
+            for seg in self.manifest["segments"]:
+                path = os.path.join(self.root, seg["name"])
+                X = np.load(path + ".X.npy")
+                y = np.load(path + ".y.npy").astype(str)
+                meta = np.empty(len(X), dtype=ROW_META)
+                meta["session"] = self._new_sessions(y) if len(y) else []
+                meta["time"] = os.path.getmtime(path + ".X.npy")
+                self._write_segment(seg["name"], X, y, meta)
+                seg["dtype"] = self.feature_dtype.name
+                rows += len(X)
+            self.manifest["version"] = STORE_VERSION
+            self._write_manifest()
+            print(f"[STORE] Migrated {len(self.manifest['segments'])} segments ({rows} rows) to schema v{STORE_VERSION}")
+
+    # --- Служебное ---
+    @staticmethod
+    def _keep_mask(seg, tombstones):
+        keep = None
+        for label, runs in seg["labels"].items():
+            if seg["id"] <= tombstones.get(label, 0):
+                if keep is None:
+                    keep = np.ones(seg["rows"], dtype=bool)
+                for a, b in runs:
+                    keep[a:b] = False
+        return keep
+
+    def _index_old_segments(self):
+        """Строит индекс меток для сегментов, записанных без него"""
+        changed = False
+        for seg in self.manifest["segments"]:
+            if "labels" not in seg:
+                y = np.load(os.path.join(self.root, seg["name"] + ".y.npy"), mmap_mode="r")
+                seg["labels"] = _label_runs(y)
+                changed = True
+        if changed:
+            self._write_manifest()
+
+    def _write_manifest(self):
+        _atomic_save_json(self.manifest_path, self.manifest)
+
+    def _release_reader(self):
+        with self._lock:
+            self._readers -= 1
+            if self._readers == 0 and self._doomed:
+                doomed, self._doomed = self._doomed, []
+                self._delete_segment_files(doomed)
+
+    def _delete_segment_files(self, segments):
+        """Файлы сегментов вне манифеста; пока их читают — откладывается до конца чтения"""
+        with self._lock:
+            if self._readers:
+                self._doomed.extend(segments)
+                return
+            for seg in segments:
+                for suffix in SEGMENT_FILES:
+                    path = os.path.join(self.root, seg["name"] + suffix)
+                    try:
+                        if os.path.exists(path):
+                            os.remove(path)
+                    except OSError:
+                        # Windows: файл еще открыт через mmap — повтор при следующем удалении
+                        self._doomed.append(seg)
+                        break
+
+    def _import_legacy(self, legacy_file):
+        """Разовый импорт старого words_dataset.npz в первый сегмент"""
+        data = np.load(legacy_file, allow_pickle=True)
+        self.append(data["X"], data["y"])
+        if self.backup_dir:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            shutil.move(legacy_file, os.path.join(self.backup_dir, "legacy_" + os.path.basename(legacy_file)))
+        print(f"[STORE] Imported {len(self)} rows from {legacy_file}")
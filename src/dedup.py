@@ -0,0 +1,169 @@
+# src/dedup.py
+"""
+Отсев почти одинаковых кадров датасета.
+
+Кадр сохраняется, только если он дальше radius от каждого из последних
+memory сохраненных кадров той же метки. radius — RMS-расстояние на одну
+координату признаков (они нормированы по размеру кисти, т.е. 0.02 = 2%
+размера руки). Статичный жест дает несколько кадров вместо сотен,
+движение сохраняется целиком.
+
+Хранилище держит все кадры (окнам динамических жестов нужны непрерывные
+сессии); фильтр применяется к обучающей выборке модели по кадру
+(NeuralEngine.train) и, по желанию, к самому хранилищу:
+
+    python -m src.dedup                      # отчет: строки и точность (CV по сессиям)
+    python -m src.dedup --radius 0.01,0.02,0.05
+    python -m src.dedup --radius 0.02 --apply  # удалить дубликаты из хранилища (ломает окна сессий)
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from src.config import DEDUP_RADIUS, DEDUP_MEMORY
+
+
+class NearDuplicateFilter:
+    """
+    Потоковый фильтр одной метки: accept(x) -> True, если кадр новый.
+    Последние memory принятых кадров лежат в кольцевом буфере,
+    проверка — одно векторное расстояние до всех (~10 мкс на кадр).
+    radius <= 0 — фильтр выключен.
+    """
+    def __init__(self, radius=DEDUP_RADIUS, memory=DEDUP_MEMORY):
+        self.radius = radius
+        self.memory = max(1, int(memory))
+        self._kept = None
+        self._limit = 0.0  # radius^2 * размер признаков (квадрат L2), задается с первым кадром
+        self._n = 0
+        self._pos = 0
+        self.seen = 0
+        self.kept = 0
+
+    def accept(self, x):
+        self.seen += 1
+        if self.radius <= 0:
+            self.kept += 1
+            return True
+        x = np.asarray(x, dtype=np.float32)
+        if self._kept is None:
+            self._kept = np.empty((self.memory, x.size), dtype=np.float32)
+            self._limit = self.radius * self.radius * x.size  # RMS -> квадрат L2
+        if self._n:
+            diff = self._kept[:self._n] - x
+            if np.einsum("ij,ij->i", diff, diff).min() < self._limit:
+                return False
+        self._kept[self._pos] = x
+        self._pos = (self._pos + 1) % self.memory
+        self._n = min(self._n + 1, self.memory)
+        self.kept += 1
+        return True
+
+    @property
+    def dropped(self):
+        return self.seen - self.kept
+
+    def reset(self):
+        self._n = 0
+        self._pos = 0
+        self.seen = 0
+        self.kept = 0
+
+
+def dedup_mask(X, y, radius=DEDUP_RADIUS, memory=DEDUP_MEMORY):
+    """Пакетный проход в порядке записи: bool-маска строк, которые остаются"""
+    filters = {}
+    keep = np.zeros(len(X), dtype=bool)
+    for i in range(len(X)):
+        label = y[i]
+        f = filters.get(label)
+        if f is None:
+            f = filters[label] = NearDuplicateFilter(radius, memory)
+        keep[i] = f.accept(X[i])
+    return keep
+
+
+def accuracy_effect(base_dir="data", radii=(DEDUP_RADIUS,), n_splits=5, seed=0):
+    """
+    Влияние отсева на точность: CV по сессиям (как src.evaluate),
+    обучающие фолды прорежены, тестовые — полные.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from src.engine import NeuralEngine
+    from src.evaluate import cached_dataset, cached_folds
+    from src.config import TRAIN_N_ESTIMATORS, TRAIN_MAX_DEPTH, TRAIN_N_JOBS
+
+    engine = NeuralEngine(base_dir=base_dir)
+    cache_dir = os.path.join(base_dir, "eval_cache")
+    key, paths = cached_dataset(engine.store, cache_dir)
+    X = np.load(paths["X"], mmap_mode="r")
+    y = np.load(paths["y"], mmap_mode="r")
+    groups = np.load(paths["groups"], mmap_mode="r")
+    classes = np.unique(y)
+    sessions = min(len(np.unique(groups[y == c])) for c in classes) if len(classes) else 0
+    n_splits = min(n_splits, sessions)
+    if len(classes) < 2 or n_splits < 2:
+        print("[DEDUP] Need 2+ gestures with 2+ recording sessions each for the accuracy check.")
+        return None
+    folds = cached_folds(key, y, groups, cache_dir, n_splits, seed)
+
+    rows = []
+    for radius in (0.0,) + tuple(radii):
+        acc, kept, total, fit_s = [], 0, 0, 0.0
+        for k in range(n_splits):
+            train = np.flatnonzero(folds != k)
+            test = folds == k
+            total += len(train)
+            train = train[dedup_mask(X[train], y[train], radius)]
+            kept += len(train)
+            t0 = time.perf_counter()
+            clf = RandomForestClassifier(n_estimators=TRAIN_N_ESTIMATORS, max_depth=TRAIN_MAX_DEPTH,
+                                         n_jobs=TRAIN_N_JOBS, random_state=seed).fit(X[train], y[train])
+            fit_s += time.perf_counter() - t0
+            acc.append(np.mean(clf.predict(X[test]) == y[test]))
+        rows.append({"radius": radius, "train_rows": kept / total, "accuracy": float(np.mean(acc)),
+                     "fit_s": fit_s / n_splits})
+        print(f"  radius {radius:<6} train rows {kept / total:>6.1%}   accuracy {np.mean(acc):.3f}   "
+              f"fit {fit_s / n_splits:.2f} s")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Near-duplicate frame filtering for the dataset")
+    parser.add_argument("--data", default="data", help="NeuralEngine base directory")
+    parser.add_argument("--radius", default=str(DEDUP_RADIUS), help="RMS radius per feature, comma-separated to compare")
+    parser.add_argument("--memory", type=int, default=DEDUP_MEMORY, help="Recent kept frames compared per gesture")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds for the accuracy check")
+    parser.add_argument("--no-eval", action="store_true", help="Skip the accuracy check")
+    parser.add_argument("--apply", action="store_true", help="Remove duplicates from the store (first radius); "
+                        "thins recording sessions used by sequence training")
+    args = parser.parse_args(argv)
+    radii = [float(r) for r in args.radius.split(",")]
+
+    from src.engine import NeuralEngine
+    engine = NeuralEngine(base_dir=args.data)
+    X, y = engine.store.load()
+    if len(X) == 0:
+        print("[DEDUP] Dataset empty.")
+        sys.exit(1)
+
+    print(f"[DEDUP] {len(X)} rows, {len(np.unique(y))} gestures")
+    for radius in radii:
+        keep = dedup_mask(X, y, radius, args.memory)
+        labels, total = np.unique(y, return_counts=True)
+        _, kept = np.unique(y[keep], return_counts=True)
+        print(f"  radius {radius}: keeps {keep.sum()} / {len(X)} rows ({keep.mean():.1%})")
+        for label, n, k in sorted(zip(labels, total, kept), key=lambda t: t[2] / t[1]):
+            print(f"    {label:<20} {k:>7} / {n:<7}")
+
+    if not args.no_eval:
+        accuracy_effect(args.data, radii, args.folds)
+
+    if args.apply:
+        before, after = engine.dedup_dataset(radii[0], args.memory)
+        print(f"[DEDUP] Removed {before - after} rows ({after} left). Retrain to apply.")
+
+
+if __name__ == "__main__":
+    main()
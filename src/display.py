@@ -0,0 +1,93 @@
+# src/display.py
+import threading
+import time
+import cv2
+import numpy as np
+from src.preprocess import apply_boost
+
+
+def fit_size(src_w, src_h, box_w, box_h):
+    """Размер кадра, вписанного в box с сохранением пропорций (как KeepAspectRatio)"""
+    scale = min(box_w / src_w, box_h / src_h)
+    return max(1, int(round(src_w * scale))), max(1, int(round(src_h * scale)))
+
+
+class DisplayFrames:
+    """
+    Готовые к показу RGB кадры под размер видео-панели.
+
+    Воркер пишет кадр в один из заранее выделенных буферов (resize + cvtColor
+    с dst=, без новых аллокаций), GUI забирает только самый свежий.
+    begin() -> уменьшенный BGR холст (зеркало и яркость уже на нем), на нем
+    рисуется оверлей, commit() публикует; publish() = begin + commit.
+    Буфер, который GUI сейчас читает, воркер не трогает: при трех буферах
+    всегда есть свободный. Если GUI не успевает, промежуточные кадры просто
+    перезаписываются (coalescing) и не копятся в очереди сигналов Qt.
+    """
+    def __init__(self, box_w, box_h, n_buffers=3):
+        self.box = (box_w, box_h)
+        self.n_buffers = n_buffers
+        self._lock = threading.Lock()
+        self._size = None
+        self._bgr = None
+        self._rgb = []
+        self._latest = None
+        self._in_use = None
+        self.published = 0
+        self.consumed = 0
+        self.published_ns = 0
+        self._consumed_seq = 0
+
+    def _ensure(self, src_w, src_h):
+        size = fit_size(src_w, src_h, *self.box)
+        if size != self._size:
+            w, h = size
+            self._bgr = np.empty((h, w, 3), dtype=np.uint8)
+            self._rgb = [np.empty((h, w, 3), dtype=np.uint8) for _ in range(self.n_buffers)]
+            with self._lock:
+                self._latest = None
+                self._in_use = None
+            self._size = size
+
+    def begin(self, frame_bgr, mirror=False, boost=1.0):
+        """Воркер: BGR кадр любого размера -> холст размера панели (BGR, для отрисовки)"""
+        h, w = frame_bgr.shape[:2]
+        self._ensure(w, h)
+        cv2.resize(frame_bgr, self._size, dst=self._bgr, interpolation=cv2.INTER_LINEAR)
+        if mirror:
+            cv2.flip(self._bgr, 1, dst=self._bgr)
+        return apply_boost(self._bgr, boost)
+
+    def commit(self):
+        """Холст -> свободный RGB буфер, который заберет GUI"""
+        with self._lock:
+            idx = next(i for i in range(self.n_buffers) if i != self._latest and i != self._in_use)
+        cv2.cvtColor(self._bgr, cv2.COLOR_BGR2RGB, dst=self._rgb[idx])
+        with self._lock:
+            self._latest = idx
+            self.published += 1
+            self.published_ns = time.perf_counter_ns()
+
+    def publish(self, frame_bgr, mirror=False, boost=1.0):
+        """Кадр без оверлея сразу на экран"""
+        self.begin(frame_bgr, mirror, boost)
+        self.commit()
+
+    def acquire(self):
+        """GUI: самый свежий непоказанный кадр (или None). Обязательно release()"""
+        with self._lock:
+            if self._latest is None or self._consumed_seq == self.published:
+                return None
+            self._in_use = self._latest
+            self._consumed_seq = self.published
+            self.consumed += 1
+            return self._rgb[self._in_use]
+
+    def release(self):
+        with self._lock:
+            self._in_use = None
+
+    @property
+    def coalesced(self):
+        """Сколько кадров было перезаписано до показа"""
+        return self.published - self.consumed
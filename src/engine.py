@@ -1,31 +1,114 @@
 # src/engine.py
 import os
-import shutil
+import threading
 import numpy as np
-import joblib
-from datetime import datetime
-from sklearn.ensemble import RandomForestClassifier
+from src.dataset_store import DatasetStore
+from src.fast_forest import FlatForest
+from src.prototypes import PrototypeIndex
+from src.dedup import dedup_mask
+from src.predict_cache import PredictionCache
+from src.model_artifact import (save_artifact, load_artifact, list_artifacts, latest_artifact,
+                                next_artifact_path, prune_artifacts, ModelFormatError)
+from src.sequence import window_features_batch, WINDOW_PARTS
+from src.config import (DATASET_KEEP_BACKUPS, DATASET_COMPACT_AT, DATASET_FEATURE_DTYPE, TRAIN_N_JOBS, TRAIN_CHUNK_TREES,
+                        TRAIN_N_ESTIMATORS, TRAIN_MAX_DEPTH, SEQ_WINDOW, DEDUP_RADIUS, DEDUP_MEMORY)
+
+NUM_LANDMARKS = 21
+HAND_FEATURES = NUM_LANDMARKS * 3  # 63 значения на руку
+# Схема признаков кадра; меняется вместе с normalize_points — старые модели не загрузятся
+FEATURE_SCHEMA = "hands2x21x3-wrist-maxdist-v1"
+
+
+def landmarks_to_array(landmarks):
+    """MediaPipe NormalizedLandmarkList -> (21, 3) float64 или None"""
+    if not landmarks:
+        return None
+    return np.array([(lm.x, lm.y, lm.z) for lm in landmarks.landmark], dtype=np.float64)
+
+
+def normalize_points(points):
+    """
+    Векторная нормализация одной руки: (21, 3) -> (63,) float32.
+    None или пустой массив -> нулевой вектор (рука не найдена).
+    """
+    if points is None or len(points) == 0:
+        return np.zeros(HAND_FEATURES, dtype=np.float32)
+
+    pts = np.asarray(points, dtype=np.float64)
+    # 1. Центрирование по запястью
+    pts = pts - pts[0]
+    # 2. Нормализация масштаба
+    max_dist = np.sqrt((pts * pts).sum(axis=1)).max()
+    if max_dist < 0.0001:
+        max_dist = 1.0
+    return (pts / max_dist).astype(np.float32).ravel()
+
+
+def normalize_hands_batch(points):
+    """
+    Пакетная нормализация для офлайн-обработки: (N, 2, 21, 3) -> (N, 126) float32.
+    Руки, у которых все координаты нулевые, считаются отсутствующими и дают нули,
+    как и normalize_points(None).
+    """
+    pts = np.asarray(points, dtype=np.float64)
+    if pts.ndim != 4 or pts.shape[1:] != (2, NUM_LANDMARKS, 3):
+        raise ValueError(f"Expected (N, 2, {NUM_LANDMARKS}, 3), got {pts.shape}")
+
+    present = np.any(pts != 0, axis=(2, 3))
+    centered = pts - pts[:, :, :1, :]
+    max_dist = np.sqrt((centered * centered).sum(axis=3)).max(axis=2)
+    max_dist[max_dist < 0.0001] = 1.0
+    out = centered / max_dist[:, :, None, None]
+    out[~present] = 0.0
+    return out.astype(np.float32).reshape(len(pts), 2 * HAND_FEATURES)
+
 
 class NeuralEngine:
     """
     Класс отвечает за 'мозги': 
-    - Управление данными (.npz)
+    - Управление данными (сегментное хранилище DatasetStore)
     - Обучение модели (RandomForest)
     - Предсказания с нормализацией
+    - Дообучение: прототипы (PrototypeIndex) обновляются при каждом
+      сохранении, новые жесты распознаются по ним до переобучения леса
+    sklearn (~1.5 с импорта) подгружается только для обучения; готовые
+    модели читаются из артефактов .ffm (models/) через mmap, без pickle.
     """
-    def __init__(self):
+    def __init__(self, base_dir="data"):
         # Пути к файлам
-        self.base_dir = "data"
-        self.data_file = os.path.join(self.base_dir, "words_dataset.npz")
-        self.model_file = os.path.join(self.base_dir, "words_model.joblib")
+        self.base_dir = base_dir
+        self.data_file = os.path.join(self.base_dir, "words_dataset.npz")  # старый формат, импортируется один раз
+        self.dataset_dir = os.path.join(self.base_dir, "dataset")
+        self.model_dir = os.path.join(self.base_dir, "models")  # words-*.ffm, words_seq-*.ffm
+        self.model_file = os.path.join(self.base_dir, "words_model.joblib")  # старый pickle, конвертируется
+        self.seq_model_file = os.path.join(self.base_dir, "words_seq_model.joblib")
         self.backup_dir = os.path.join(self.base_dir, "backups")
         
         # Автосоздание папок
         os.makedirs(self.base_dir, exist_ok=True)
         os.makedirs(self.backup_dir, exist_ok=True)
+        os.makedirs(self.model_dir, exist_ok=True)
+
+        self.store = DatasetStore(self.dataset_dir, legacy_file=self.data_file,
+                                  backup_dir=self.backup_dir, keep_backups=DATASET_KEEP_BACKUPS,
+                                  feature_dtype=DATASET_FEATURE_DTYPE)
         
-        self.model = None
+        self.model = None       # sklearn-лес только после обучения в этом процессе
+        self.fast_model = None  # FlatForest: быстрый инференс по кадру (из артефакта — mmap)
         self.is_trained = False
+        self.dirty = False  # Данные изменились после последнего обучения
+        self.model_version = 0  # Растет при каждой подмене модели
+        self.predict_cache = PredictionCache()  # predict() по кадру; сбрасывается с model_version
+        self._model_lock = threading.Lock()
+        self.seq_model = None   # Модель по окнам кадров (динамические жесты)
+        self.seq_fast = None
+        # Прототипы всех жестов; жесты, которых еще нет в лесу (pending), распознаются по ним
+        self.prototypes = None
+        self.pending_labels = frozenset()
+        self.fresh_index = None  # (PrototypeIndex, pending) или None, если лес знает все жесты
+        # Запись в хранилище + учет в _recent — одно целое (см. save_dataset / train)
+        self._proto_lock = threading.RLock()
+        self._recent = []  # Сохранения во время обучения: (X, y) поверх снимка датасета
         self.load_model()
 
     def normalize_hand(self, landmarks):
@@ -33,126 +116,332 @@ class NeuralEngine:
         МЯСО: Делает распознавание независимым от положения руки.
         Вызывается в VideoWorker перед сохранением или предсказанием.
         """
-        if not landmarks:
-            return [0.0] * 63
-        
-        # 1. Центрирование по запястью
-        wrist = landmarks.landmark[0]
-        pts = []
-        for lm in landmarks.landmark:
-            pts.append([lm.x - wrist.x, lm.y - wrist.y, lm.z - wrist.z])
-        
-        # 2. Нормализация масштаба
-        max_dist = max([np.linalg.norm(p) for p in pts]) if pts else 1.0
-        if max_dist < 0.0001: max_dist = 1.0
-        
-        flat = []
-        for p in pts:
-            flat.extend([p[0]/max_dist, p[1]/max_dist, p[2]/max_dist])
-        return flat
+        return normalize_points(landmarks_to_array(landmarks))
 
     def load_model(self):
-        """Загрузка обученной модели"""
-        if os.path.exists(self.model_file):
+        """Загрузка обученных моделей (артефакты .ffm; старый pickle конвертируется один раз)"""
+        self._migrate_pickle(self.model_file, "words", FEATURE_SCHEMA)
+        self._migrate_pickle(self.seq_model_file, "words_seq", self._seq_schema(SEQ_WINDOW))
+
+        fast = self._load_forest("words", FEATURE_SCHEMA)
+        if fast is not None:
+            self._set_fast_model(fast)
+            print("[ENGINE] Model loaded.")
+        fast = self._load_forest("words_seq", self._seq_schema(SEQ_WINDOW))
+        if fast is not None:
+            with self._model_lock:
+                self.seq_fast = fast
+            print("[ENGINE] Sequence model loaded.")
+        index = self._load_forest("words_proto", FEATURE_SCHEMA, PrototypeIndex)
+        if index is not None:
+            self._set_prototypes(index)
+        return self.is_trained
+
+    @staticmethod
+    def _seq_schema(window):
+        return f"window{WINDOW_PARTS}x{window}-{FEATURE_SCHEMA}"
+
+    def _load_forest(self, name, schema, cls=FlatForest):
+        """Новейшая исправная версия артефакта или None; битые/несовместимые пропускаются"""
+        for path in reversed(list_artifacts(self.model_dir, name)):
             try:
-                self.model = joblib.load(self.model_file)
-                self.is_trained = True
-                print("[ENGINE] Model loaded.")
-                return True
-            except:
-                print("[ENGINE] Model corruption detected.")
-        return False
-
-    def save_dataset(self, new_X, new_y):
-        """Сохранение новых жестов в .npz с бэкапом"""
+                arrays, meta = load_artifact(path)
+                if meta.get("feature_schema") != schema:
+                    raise ModelFormatError(f"feature schema {meta.get('feature_schema')!r}, expected {schema!r}")
+                return cls.from_arrays(arrays, meta)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[ENGINE] Cannot load {os.path.basename(path)}: {e}")
+        return None
+
+    def _save_forest(self, name, fast, schema):
+        arrays, meta = fast.to_arrays()
+        meta["feature_schema"] = schema
+        path = save_artifact(next_artifact_path(self.model_dir, name), arrays, meta)
+        prune_artifacts(self.model_dir, name)
+        return path
+
+    def _migrate_pickle(self, pickle_file, name, schema):
+        """words_model.joblib (до артефактов) -> models/words-000001.ffm"""
+        if not os.path.exists(pickle_file) or latest_artifact(self.model_dir, name) is not None:
+            return
+        import joblib
+        try:
+            path = self._save_forest(name, FlatForest.from_sklearn(joblib.load(pickle_file)), schema)
+            print(f"[ENGINE] Converted {os.path.basename(pickle_file)} -> {os.path.basename(path)}")
+        except Exception as e:
+            print(f"[ENGINE] Model corruption detected ({os.path.basename(pickle_file)}): {e}")
+
+    def save_dataset(self, new_X, new_y, timestamps=None, sessions=None):
+        """
+        Сохранение новых жестов: один новый сегмент + дешевый бэкап.
+        timestamps / sessions — метаданные строк (см. DatasetStore.append).
+        """
         if len(new_X) == 0: return 0
 
-        # БЭКАП перед записью
-        if os.path.exists(self.data_file):
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            shutil.copy(self.data_file, os.path.join(self.backup_dir, f"backup_{timestamp}.npz"))
-            
-            # Загрузка старых и объединение
-            loaded = np.load(self.data_file, allow_pickle=True)
-            X = np.vstack((loaded['X'], np.array(new_X)))
-            y = np.concatenate((loaded['y'], np.array(new_y)))
+        # БЭКАП перед записью (снимок из жестких ссылок, с ротацией)
+        self.store.backup()
+        # Атомарно с learn_incremental: строки попадают либо в снимок train(), либо в _recent, не в оба
+        with self._proto_lock:
+            count = self.store.append(new_X, new_y, timestamps=timestamps, sessions=sessions)
+            self.dirty = True
+            self.learn_incremental(new_X, new_y)
+
+        # Периодическое слияние мелких сегментов
+        if self.store.segment_count >= DATASET_COMPACT_AT:
+            self.store.compact()
+        return count
+
+    def learn_incremental(self, new_X, new_y):
+        """
+        Дообучение за миллисекунды: новые кадры добавляются в индекс
+        прототипов. Полное переобучение леса — позже, в фоне (dirty).
+        """
+        with self._proto_lock:
+            index = self.prototypes
+            if index is None:
+                # Первый раз (модель без прототипов): индекс по всему датасету, включая новые кадры
+                index = PrototypeIndex.from_dataset(*self.store.load())
+            else:
+                index = index.extended(new_X, new_y)
+            self._recent.append((np.asarray(new_X, dtype=np.float32), np.asarray(new_y).astype(str)))
+            self._save_forest("words_proto", index, FEATURE_SCHEMA)
+            self._set_prototypes(index)
+
+    def _set_prototypes(self, index):
+        with self._model_lock:
+            self.prototypes = index
+            self._refresh_pending()
+            self.model_version += 1
+
+    def _refresh_pending(self):
+        """Жесты индекса, которых не знает лес (под _model_lock)"""
+        index = self.prototypes
+        if index is None or len(index) == 0:
+            self.pending_labels = frozenset()
         else:
-            X = np.array(new_X)
-            y = np.array(new_y)
+            known = set(str(c) for c in self.fast_model.classes_) if self.fast_model is not None else set()
+            self.pending_labels = frozenset(index.label_set() - known)
+        self.fresh_index = (index, self.pending_labels) if self.pending_labels else None
 
-        np.savez(self.data_file, X=X, y=y)
-        return len(new_X)
+    def dedup_dataset(self, radius=DEDUP_RADIUS, memory=DEDUP_MEMORY):
+        """
+        Пакетный отсев почти одинаковых кадров в хранилище (см. src/dedup.py) -> (было, стало).
+        Сессии прореживаются: окна динамических жестов после этого строятся с пропусками.
+        """
+        X, y = self.store.load()
+        if len(X) == 0:
+            return 0, 0
+        keep = dedup_mask(X, y, radius, memory)
+        if keep.all():
+            return len(X), len(X)
+        self.store.backup()
+        self.store.filter_rows(keep)
+        self.dirty = True
+        return len(X), int(keep.sum())
 
     def remove_label(self, label_to_remove):
         """
-        ТОЧЕЧНОЕ УДАЛЕНИЕ: вырезает жест из бинарного файла .npz
+        ТОЧЕЧНОЕ УДАЛЕНИЕ: надгробие в хранилище, без перезаписи файлов.
+        Переобучение откладывается (dirty) — см. train_if_dirty().
         """
-        if not os.path.exists(self.data_file):
+        if len(self.store) == 0:
             return False, "Database file not found."
 
         try:
-            # 1. Загружаем текущие данные
-            data = np.load(self.data_file, allow_pickle=True)
-            X, y = data['X'], data['y']
-
-            # 2. Создаем маску для фильтрации
-            mask = (y != label_to_remove)
-            removed_count = len(y) - np.sum(mask)
-
-            if removed_count == 0:
+            if label_to_remove not in self.store.label_counts():
                 return False, f"Gesture '{label_to_remove}' not found."
 
-            # 3. Фильтруем
-            new_X = X[mask]
-            new_y = y[mask]
+            self.store.backup()
+            removed_count = self.store.delete_label(label_to_remove)
+            with self._proto_lock:
+                self._recent = [(X, y) for X, y in self._recent if label_to_remove not in y]
+                if self.prototypes is not None:
+                    index = self.prototypes.without(label_to_remove)
+                    self._save_forest("words_proto", index, FEATURE_SCHEMA)
+                    self._set_prototypes(index)
 
-            # 4. Сохраняем обратно (если что-то осталось)
-            if len(new_y) > 0:
-                np.savez(self.data_file, X=new_X, y=new_y)
-            else:
-                os.remove(self.data_file) # Если удалили последний жест
-
-            # 5. Переобучаем модель
-            success, msg = self.train()
-            return True, f"Successfully removed {removed_count} samples. {msg}"
+            self.dirty = True
+            return True, f"Successfully removed {removed_count} samples. Retraining scheduled."
 
         except Exception as e:
             return False, f"Error during removal: {str(e)}"
 
-    def train(self):
-        """Обучение RandomForest на всех ядрах CPU"""
-        if not os.path.exists(self.data_file):
+    def train_if_dirty(self):
+        """Одно переобучение на пачку изменений"""
+        if not self.dirty:
+            return False, "Model is up to date."
+        return self.train()
+
+    def train(self, progress=None, cancel_event=None, n_jobs=TRAIN_N_JOBS,
+              n_estimators=TRAIN_N_ESTIMATORS, max_depth=TRAIN_MAX_DEPTH):
+        """
+        Обучение RandomForest порциями деревьев (warm_start).
+        progress(done, total) вызывается после каждой порции,
+        cancel_event (threading.Event) прерывает обучение между порциями.
+        Можно вызывать из фонового потока: готовая модель подменяется атомарно.
+        Почти одинаковые кадры (DEDUP_RADIUS) в обучение не идут; хранилище
+        их сохраняет — train_sequence нужны непрерывные сессии.
+        """
+        if len(self.store) == 0:
             return False, "Dataset empty."
 
+        self.dirty = False
         try:
-            data = np.load(self.data_file, allow_pickle=True)
-            X, y = data['X'], data['y']
+            with self._proto_lock:
+                self._recent = []
+                X, y = self.store.load()
 
             classes = np.unique(y)
             if len(classes) < 2:
+                self.dirty = True
                 return False, "Need at least 2 different gestures to train."
 
-            # Настройки для "Мяса": n_jobs=-1 использует весь процессор
-            clf = RandomForestClassifier(n_estimators=100, max_depth=20, n_jobs=-1)
+            keep = dedup_mask(X, y)
+            clf = self._fit_forest(X[keep], y[keep], progress, cancel_event, n_jobs, n_estimators, max_depth)
+            if clf is None:
+                self.dirty = True
+                return False, "Training cancelled."
+
+            self.swap_model(clf)
+            self._rebuild_prototypes(X, y)
+            return True, f"Trained on {int(keep.sum())} of {len(X)} samples ({len(classes)} classes)."
+        except Exception as e:
+            self.dirty = True
+            return False, f"Training error: {str(e)}"
+
+    def train_sequence(self, window=SEQ_WINDOW, progress=None, cancel_event=None,
+                       n_jobs=TRAIN_N_JOBS, n_estimators=TRAIN_N_ESTIMATORS, max_depth=TRAIN_MAX_DEPTH):
+        """
+        Обучение модели динамических жестов на окнах из записанных сессий.
+        Сессия = непрерывный участок одной метки и одной записи (ROW_META["session"]).
+        """
+        try:
+            parts_X, parts_y = [], []
+            for label, X_run in self.store.iter_label_runs():
+                W = window_features_batch(X_run, window)
+                if len(W):
+                    parts_X.append(W)
+                    parts_y.extend([label] * len(W))
+
+            if len(set(parts_y)) < 2:
+                return False, f"Need at least 2 gestures with {window}+ frame sessions."
+
+            Xw = np.vstack(parts_X)
+            y = np.array(parts_y)
+            clf = self._fit_forest(Xw, y, progress, cancel_event, n_jobs, n_estimators, max_depth)
+            if clf is None:
+                return False, "Training cancelled."
+
+            fast = FlatForest.from_sklearn(clf)
+            self._save_forest("words_seq", fast, self._seq_schema(window))
+            if window == SEQ_WINDOW:
+                with self._model_lock:
+                    self.seq_model = clf
+                    self.seq_fast = fast
+            return True, f"Sequence model: {len(Xw)} windows of {window} frames."
+        except Exception as e:
+            return False, f"Sequence training error: {str(e)}"
+
+    @staticmethod
+    def _fit_forest(X, y, progress, cancel_event, n_jobs, n_estimators, max_depth):
+        """RandomForest порциями деревьев; None — если обучение отменено"""
+        from sklearn.ensemble import RandomForestClassifier
+        # n_jobs ограничен TRAIN_N_JOBS, чтобы не отнимать все ядра у видео
+        clf = RandomForestClassifier(n_estimators=0, max_depth=max_depth,
+                                     n_jobs=n_jobs, warm_start=True)
+        step = max(1, TRAIN_CHUNK_TREES)
+        for done in range(step, n_estimators + step, step):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            clf.n_estimators = min(done, n_estimators)
             clf.fit(X, y)
-            
-            joblib.dump(clf, self.model_file)
+            if progress is not None:
+                progress(clf.n_estimators, n_estimators)
+        clf.warm_start = False
+        return clf
+
+    def swap_model(self, clf):
+        """
+        Атомарная подмена модели: сначала новая версия артефакта
+        (tmp + os.replace), затем ссылки под блокировкой.
+        """
+        fast = FlatForest.from_sklearn(clf)
+        self._save_forest("words", fast, FEATURE_SCHEMA)
+        self._set_fast_model(fast, clf)
+
+    def _rebuild_prototypes(self, X, y):
+        """Индекс заново по снимку обучения + сохранения, сделанные во время обучения"""
+        with self._proto_lock:
+            index = PrototypeIndex.from_dataset(X, y)
+            for new_X, new_y in self._recent:
+                index = index.extended(new_X, new_y)
+            self._recent = []
+            self._save_forest("words_proto", index, FEATURE_SCHEMA)
+            self._set_prototypes(index)
+
+    def _set_fast_model(self, fast, clf=None):
+        with self._model_lock:
             self.model = clf
+            self.fast_model = fast
             self.is_trained = True
-            
-            return True, f"Trained on {len(X)} samples ({len(classes)} classes)."
-        except Exception as e:
-            return False, f"Training error: {str(e)}"
+            self._refresh_pending()
+            self.model_version += 1
 
     def predict(self, features):
-        """Предсказание (126,) -> (Label, Conf)"""
-        if not self.is_trained or self.model is None:
+        """Предсказание (126,) -> (Label, Conf); почти неподвижная рука — из кэша"""
+        cache = self.predict_cache
+        if not cache.enabled:
+            return self._predict_one(features)
+        version = self.model_version  # до чтения моделей: устаревший ответ не попадет в кэш новой версии
+        result, key = cache.get(features, version)
+        if result is None:
+            result = self._predict_one(features)
+            cache.put(features, key, version, result)
+        return result
+
+    def _predict_one(self, features):
+        """(126,) -> (Label, Conf) через FlatForest (новые жесты — через прототипы)"""
+        fast = self.fast_model  # одна ссылка на весь вызов (модель может подмениться)
+        fresh = self.fresh_index
+        if fresh is not None:
+            index, pending = fresh
+            label, conf = index.predict_one(features)
+            if label in pending:
+                return label, conf
+        if not self.is_trained or fast is None:
             return "...", 0.0
         
         try:
-            feat_arr = np.array(features).reshape(1, -1)
-            probs = self.model.predict_proba(feat_arr)[0]
+            probs = fast.predict_proba_one(features)
             idx = np.argmax(probs)
-            return self.model.classes_[idx], probs[idx]
-        except:
-            return "...", 0.0
\ No newline at end of file
+            return fast.classes_[idx], probs[idx]
+        except Exception:
+            return "...", 0.0
+
+    def predict_batch(self, X):
+        """Пакетное предсказание (N, 126) -> (labels, confs)"""
+        fast = self.fast_model
+        fresh = self.fresh_index
+        if not self.is_trained or fast is None:
+            labels, confs = np.full(len(X), "...", dtype=object), np.zeros(len(X))
+        else:
+            probs = fast.predict_proba(X)
+            idx = np.argmax(probs, axis=1)
+            labels, confs = fast.classes_[idx].astype(object), probs[np.arange(len(idx)), idx]
+        if fresh is not None:
+            index, pending = fresh
+            probs = index.predict_proba(X)
+            idx = np.argmax(probs, axis=1)
+            new = np.isin(index.labels[idx], list(pending))
+            labels[new] = index.labels[idx[new]]
+            confs[new] = probs[new, idx[new]]
+        return labels, confs
+
+    def predict_sequence(self, window_features):
+        """Предсказание по признакам окна (5 * 126,) -> (Label, Conf)"""
+        fast = self.seq_fast
+        if fast is None:
+            return "...", 0.0
+        probs = fast.predict_proba_one(window_features)
+        idx = np.argmax(probs)
+        return fast.classes_[idx], probs[idx]
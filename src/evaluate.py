@@ -0,0 +1,303 @@
+# src/evaluate.py
+"""
+Оценка модели и подбор гиперпараметров по записанному датасету.
+
+Кросс-валидация стратифицирована по меткам и разбита по сессиям записи:
+сессия = одна запись жеста (id сессии хранится у каждой строки), все ее
+кадры попадают в один фолд (соседние кадры почти одинаковы — иначе
+точность завышена). Сетка параметров x фолды считается пулом процессов.
+
+Датасет и разбиение кэшируются в data/eval_cache по отпечатку манифеста
+хранилища: повторный запуск без новых записей не читает сегменты заново,
+воркеры открывают кэш через mmap.
+
+Обучающая часть фолда прореживается как в NeuralEngine.train (dedup_mask,
+DEDUP_RADIUS), тестовая — целиком: оценивается то же, что обучает приложение.
+
+Для каждой конфигурации: точность (среднее/разброс по фолдам), матрица
+ошибок, размер FlatForest и задержка предсказания одного кадра.
+
+    python -m src.evaluate
+    python -m src.evaluate --grid n_estimators=25,50,100 max_depth=10,20,None --min-accuracy 0.95
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from src.config import TRAIN_N_ESTIMATORS, TRAIN_MAX_DEPTH, DEDUP_RADIUS, DEDUP_MEMORY
+
+DEFAULT_GRID = {"n_estimators": [25, 50, TRAIN_N_ESTIMATORS], "max_depth": [10, TRAIN_MAX_DEPTH]}
+LATENCY_SAMPLES = 200  # Кадров на замер задержки в каждом фолде
+
+# Кэш датасета, открытый в процессе-воркере (см. _init_worker)
+_data = None
+
+
+# --- Датасет и фолды ---
+
+def dataset_key(store):
+    """Ключ кэша: отпечаток хранилища (включает версию схемы — миграция дает новый ключ)"""
+    return store.fingerprint()
+
+
+def load_grouped(store):
+    """-> X, y, groups: groups — номер сессии записи для каждой строки (переживает compact)"""
+    X, y, meta = store.load(with_meta=True)
+    return X, y, np.ascontiguousarray(meta["session"])
+
+
+def cached_dataset(store, cache_dir):
+    """X, y, groups из кэша (mmap) или из хранилища с записью в кэш"""
+    key = dataset_key(store)
+    paths = {name: os.path.join(cache_dir, f"{key}.{name}.npy") for name in ("X", "y", "groups")}
+    if not all(os.path.exists(p) for p in paths.values()):
+        os.makedirs(cache_dir, exist_ok=True)
+        for name, arr in zip(("X", "y", "groups"), load_grouped(store)):
+            _save_atomic(paths[name], arr)
+        _prune_cache(cache_dir, key)
+    return key, paths
+
+
+def cached_folds(key, y, groups, cache_dir, n_splits, seed):
+    """Номер тестового фолда для каждой строки (StratifiedGroupKFold), с кэшем"""
+    path = os.path.join(cache_dir, f"{key}.folds-k{n_splits}-s{seed}.npy")
+    if os.path.exists(path):
+        return np.load(path)
+    from sklearn.model_selection import StratifiedGroupKFold
+    folds = np.empty(len(y), dtype=np.int16)
+    splitter = StratifiedGroupKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    for k, (_, test) in enumerate(splitter.split(np.zeros(len(y)), y, groups)):
+        folds[test] = k
+    _save_atomic(path, folds)
+    return folds
+
+
+def cached_train_masks(key, X, y, folds, cache_dir, n_splits, seed, radius=DEDUP_RADIUS, memory=DEDUP_MEMORY):
+    """
+    (n_splits, N) bool: строки обучающей части каждого фолда после dedup_mask
+    (как в NeuralEngine.train), с кэшем. -> путь к файлу
+    """
+    from src.dedup import dedup_mask
+    path = os.path.join(cache_dir, f"{key}.train-k{n_splits}-s{seed}-r{radius}-m{memory}.npy")
+    if not os.path.exists(path):
+        masks = np.zeros((n_splits, len(y)), dtype=bool)
+        for k in range(n_splits):
+            train = np.flatnonzero(folds != k)
+            masks[k, train[dedup_mask(X[train], y[train], radius, memory)]] = True
+        _save_atomic(path, masks)
+    return path
+
+
+def _save_atomic(path, arr):
+    """tmp + os.replace: прерванный запуск не оставляет обрезанный .npy в кэше"""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def _prune_cache(cache_dir, keep_key):
+    """Кэш устаревших версий датасета удаляется"""
+    for fname in os.listdir(cache_dir):
+        if not fname.startswith(keep_key):
+            try:
+                os.remove(os.path.join(cache_dir, fname))
+            except OSError:
+                pass
+
+
+# --- Воркер: одна конфигурация на одном фолде ---
+
+def _init_worker(paths, folds_path, train_path):
+    global _data
+    _data = {name: np.load(p, mmap_mode="r") for name, p in paths.items()}
+    _data["folds"] = np.load(folds_path, mmap_mode="r")
+    _data["train"] = np.load(train_path, mmap_mode="r")
+
+
+def _run_fold(task):
+    from sklearn.ensemble import RandomForestClassifier
+    from src.fast_forest import FlatForest
+    params, fold, classes, seed = task
+    X, y, folds = _data["X"], _data["y"], _data["folds"]
+    test = folds == fold
+    train = np.flatnonzero(_data["train"][fold])  # без почти одинаковых кадров, тест — целиком
+
+    t0 = time.perf_counter()
+    clf = RandomForestClassifier(n_jobs=1, random_state=seed, **params).fit(X[train], y[train])
+    fit_s = time.perf_counter() - t0
+    fast = FlatForest.from_sklearn(clf)
+
+    X_test, y_test = np.asarray(X[test]), y[test]
+    pred = fast.predict(X_test)
+    index = {c: i for i, c in enumerate(classes)}
+    confusion = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    np.add.at(confusion, ([index[c] for c in y_test], [index[c] for c in pred]), 1)
+
+    # Задержка как в VideoWorker: один кадр, predict_proba_one
+    sample = X_test[:LATENCY_SAMPLES]
+    latency = []
+    for x in sample:
+        t = time.perf_counter_ns()
+        fast.predict_proba_one(x)
+        latency.append(time.perf_counter_ns() - t)
+
+    return {"params": params, "fold": fold, "accuracy": float(np.mean(pred == y_test)),
+            "confusion": confusion, "fit_s": fit_s, "latency_ns": latency,
+            "model_bytes": fast.nbytes, "depth": fast.depth}
+
+
+# --- Сводка ---
+
+def summarize(params, results, classes):
+    acc = np.array([r["accuracy"] for r in results])
+    confusion = sum(r["confusion"] for r in results)
+    latency = np.concatenate([r["latency_ns"] for r in results]) / 1000
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+    diag = np.diag(confusion)
+    per_class = {str(c): {"support": int(support[i]),
+                          "recall": float(diag[i] / support[i]) if support[i] else None,
+                          "precision": float(diag[i] / predicted[i]) if predicted[i] else None}
+                 for i, c in enumerate(classes)}
+    return {
+        "params": params,
+        "accuracy_mean": float(acc.mean()),
+        "accuracy_std": float(acc.std()),
+        "fold_accuracy": [round(float(a), 4) for a in acc],
+        "latency_p50_us": float(np.percentile(latency, 50)) if len(latency) else None,
+        "latency_p95_us": float(np.percentile(latency, 95)) if len(latency) else None,
+        "model_kb": float(np.mean([r["model_bytes"] for r in results]) / 1024),
+        "depth": int(max(r["depth"] for r in results)),
+        "fit_s": float(np.mean([r["fit_s"] for r in results])),
+        "per_class": per_class,
+        "confusion": confusion.tolist(),
+    }
+
+
+def choose(configs, min_accuracy):
+    """Самая быстрая конфигурация с точностью >= min_accuracy, иначе самая точная"""
+    passing = [c for c in configs if c["accuracy_mean"] >= min_accuracy]
+    if passing:
+        return min(passing, key=lambda c: (c["latency_p50_us"], c["model_kb"]))
+    return max(configs, key=lambda c: c["accuracy_mean"])
+
+
+def expand_grid(grid):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def parse_grid(items):
+    """["n_estimators=25,50", "max_depth=10,None"] -> {"n_estimators": [25, 50], "max_depth": [10, None]}"""
+    grid = {}
+    for item in items:
+        name, _, values = item.partition("=")
+        if not values:
+            raise ValueError(f"Bad grid item '{item}', expected name=v1,v2")
+        grid[name] = [_parse_value(v) for v in values.split(",")]
+    return grid
+
+
+def _parse_value(v):
+    if v == "None":
+        return None
+    for cast in (int, float):
+        try:
+            return cast(v)
+        except ValueError:
+            pass
+    return v
+
+
+def evaluate(base_dir="data", grid=None, n_splits=5, workers=None, seed=0, min_accuracy=0.9):
+    from src.engine import NeuralEngine
+    engine = NeuralEngine(base_dir=base_dir)
+    cache_dir = os.path.join(base_dir, "eval_cache")
+
+    t0 = time.perf_counter()
+    key, paths = cached_dataset(engine.store, cache_dir)
+    y = np.load(paths["y"], mmap_mode="r")
+    groups = np.load(paths["groups"], mmap_mode="r")
+    classes = np.unique(y)
+    if len(classes) < 2:
+        print("[EVAL] Need at least 2 different gestures.")
+        return None
+
+    # Фолдов не больше, чем сессий самой редкой метки
+    sessions = {str(c): len(np.unique(groups[y == c])) for c in classes}
+    n_splits = min(n_splits, min(sessions.values()))
+    if n_splits < 2:
+        rare = [c for c, n in sessions.items() if n < 2]
+        print(f"[EVAL] Every gesture needs 2+ recording sessions, only one for: {', '.join(rare)}")
+        return None
+    folds = cached_folds(key, y, groups, cache_dir, n_splits, seed)
+    train_path = cached_train_masks(key, np.load(paths["X"], mmap_mode="r"), y, folds, cache_dir, n_splits, seed)
+    load_s = time.perf_counter() - t0
+    print(f"[EVAL] {len(y)} samples, {len(classes)} gestures, {len(np.unique(groups))} sessions, "
+          f"{n_splits} folds (data {load_s:.2f} s)")
+
+    configs = expand_grid(grid or DEFAULT_GRID)
+    tasks = [(params, k, classes, seed) for params in configs for k in range(n_splits)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    folds_path = os.path.join(cache_dir, f"{key}.folds-k{n_splits}-s{seed}.npy")
+
+    by_config = {}
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(paths, folds_path, train_path)) as pool:
+        for i, result in enumerate(pool.map(_run_fold, tasks), 1):
+            by_config.setdefault(json.dumps(result["params"], sort_keys=True), []).append(result)
+            print(f"[EVAL] {i}/{len(tasks)} {result['params']} fold {result['fold']}: "
+                  f"{result['accuracy']:.3f}")
+
+    summaries = [summarize(json.loads(k), results, classes) for k, results in by_config.items()]
+    best = choose(summaries, min_accuracy)
+    return {
+        "dataset": {"key": key, "samples": int(len(y)), "classes": [str(c) for c in classes],
+                    "sessions_per_class": sessions, "folds": n_splits, "seed": seed},
+        "min_accuracy": min_accuracy,
+        "workers": workers,
+        "configs": summaries,
+        "best": best["params"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validated model evaluation and hyperparameter search")
+    parser.add_argument("--data", default="data", help="NeuralEngine base directory")
+    parser.add_argument("--grid", nargs="*", default=None,
+                        help="RandomForest params, e.g. n_estimators=25,50 max_depth=10,None")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds (split by session)")
+    parser.add_argument("--workers", type=int, default=None, help="Process count (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0, help="Fold shuffle and forest seed")
+    parser.add_argument("--min-accuracy", type=float, default=0.9, help="Accuracy bar for choosing the fastest model")
+    parser.add_argument("--out", default="eval_report.json", help="JSON report path")
+    args = parser.parse_args(argv)
+
+    try:
+        grid = parse_grid(args.grid) if args.grid else None
+    except ValueError as e:
+        parser.error(str(e))
+    report = evaluate(args.data, grid, args.folds, args.workers, args.seed, args.min_accuracy)
+    if report is None:
+        sys.exit(1)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[EVAL] Report written to {args.out}")
+
+    print(f"  {'params':<40} {'accuracy':>15} {'p50 us':>8} {'p95 us':>8} {'size KB':>8}")
+    for c in sorted(report["configs"], key=lambda c: -c["accuracy_mean"]):
+        mark = "*" if c["params"] == report["best"] else " "
+        print(f"{mark} {json.dumps(c['params']):<40} {c['accuracy_mean']:>8.3f} ±{c['accuracy_std']:.3f} "
+              f"{c['latency_p50_us']:>8.1f} {c['latency_p95_us']:>8.1f} {c['model_kb']:>8.1f}")
+    best = next(c for c in report["configs"] if c["params"] == report["best"])
+    weak = sorted(((v["recall"], k) for k, v in best["per_class"].items() if v["recall"] is not None))[:5]
+    print("  weakest gestures (recall): " + ", ".join(f"{k} {r:.2f}" for r, k in weak))
+    print(f"  -> TRAIN_N_ESTIMATORS / TRAIN_MAX_DEPTH in config.py: {report['best']}")
+
+
+if __name__ == "__main__":
+    main()
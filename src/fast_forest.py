@@ -0,0 +1,135 @@
+# src/fast_forest.py
+import numpy as np
+
+
+class FlatForest:
+    """
+    Быстрый инференс обученного RandomForestClassifier без накладных
+    расходов sklearn/joblib на каждый вызов.
+
+    Все деревья склеены в плоские массивы узлов. Листья ссылаются сами на
+    себя, поэтому обход — это max_depth векторных шагов сразу по всем
+    деревьям (и по всем строкам пачки), без ветвлений в Python.
+    Дети хранятся парами: children[2 * node + (x > threshold)].
+
+    Компактно: feature int16, пороги float32, вероятности float32 только
+    для листьев (leaf_of: узел -> строка leaf_proba). Пороги округлены
+    вниз до float32, поэтому для float32 признаков сравнение
+    x <= threshold дает тот же путь, что и в sklearn с порогами float64.
+    Массивы могут быть read-only представлениями mmap (см. model_artifact).
+    """
+    ARRAYS = ("children", "feature", "threshold", "leaf_of", "leaf_proba", "roots")
+
+    def __init__(self, children, feature, threshold, leaf_of, leaf_proba, roots, depth, classes,
+                 n_features_in=None):
+        self.children = children
+        self.feature = feature
+        self.threshold = threshold
+        self.leaf_of = leaf_of
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.depth = int(depth)
+        self.classes_ = classes
+        self.n_features_in_ = n_features_in
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        children, features, thresholds, leaf_of, probas, roots = [], [], [], [], [], []
+        offset = 0
+        n_leaves = 0
+        depth = 0
+        for est in forest.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            idx = np.arange(n, dtype=np.int32)
+            is_leaf = tree.children_left < 0
+
+            left = np.where(is_leaf, idx, tree.children_left).astype(np.int32) + offset
+            right = np.where(is_leaf, idx, tree.children_right).astype(np.int32) + offset
+            children.append(np.stack((left, right), axis=1).ravel())
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int16))
+
+            # float32 порог <= float64 порога: для float32 x условия равносильны
+            thr = tree.threshold.astype(np.float32)
+            thr = np.where(thr.astype(np.float64) > tree.threshold, np.nextafter(thr, np.float32(-np.inf)), thr)
+            thresholds.append(np.where(is_leaf, np.float32(np.inf), thr).astype(np.float32))
+
+            value = tree.value[is_leaf, 0, :].astype(np.float64)
+            norm = value.sum(axis=1, keepdims=True)
+            norm[norm == 0] = 1.0
+            probas.append((value / norm).astype(np.float32))
+            rows = np.full(n, -1, dtype=np.int32)
+            rows[is_leaf] = np.arange(n_leaves, n_leaves + is_leaf.sum(), dtype=np.int32)
+            leaf_of.append(rows)
+
+            roots.append(offset)
+            offset += n
+            n_leaves += int(is_leaf.sum())
+            depth = max(depth, tree.max_depth)
+
+        if forest.n_features_in_ > np.iinfo(np.int16).max:
+            raise ValueError("Too many features for int16 indices")
+        return cls(np.concatenate(children), np.concatenate(features), np.concatenate(thresholds),
+                   np.concatenate(leaf_of), np.concatenate(probas), np.array(roots, dtype=np.int32),
+                   depth, np.asarray(forest.classes_), int(forest.n_features_in_))
+
+    def to_arrays(self):
+        """-> (arrays, meta) для model_artifact.save_artifact"""
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        meta = {"depth": self.depth, "classes": [str(c) for c in self.classes_],
+                "n_features": self.n_features_in_, "n_estimators": self.n_estimators,
+                "n_nodes": int(len(self.feature))}
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        missing = [name for name in cls.ARRAYS if name not in arrays]
+        if missing:
+            raise ValueError(f"Missing arrays: {missing}")
+        return cls(*(arrays[name] for name in cls.ARRAYS), meta["depth"],
+                   np.array(meta["classes"]), meta.get("n_features"))
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def _leaves(self, X):
+        """X (N, F) float32 -> индексы узлов-листьев (N, T)"""
+        n, n_feat = X.shape
+        flat_X = X.ravel()
+        row_offset = (np.arange(n) * n_feat)[:, None]
+        nodes = np.broadcast_to(self.roots, (n, len(self.roots)))
+        for _ in range(self.depth):
+            go_right = flat_X.take(row_offset + self.feature.take(nodes)) > self.threshold.take(nodes)
+            nodes = self.children.take(nodes * 2 + go_right)
+        return nodes
+
+    def _prepare(self, X):
+        # Как в sklearn: признаки приводятся к float32 перед сравнением
+        X = np.asarray(X, dtype=np.float32)
+        return X.reshape(1, -1) if X.ndim == 1 else X
+
+    def predict_proba(self, X):
+        """(N, F) или (F,) -> (N, n_classes)"""
+        X = self._prepare(X)
+        if len(X) == 1:
+            return self._proba_one(X[0])[None, :]
+        return self.leaf_proba[self.leaf_of.take(self._leaves(X))].mean(axis=1, dtype=np.float64)
+
+    def predict_proba_one(self, x):
+        """Путь для одного кадра: (F,) -> (n_classes,)"""
+        return self._proba_one(self._prepare(x)[0])
+
+    def _proba_one(self, x):
+        nodes = self.roots
+        for _ in range(self.depth):
+            go_right = x.take(self.feature.take(nodes)) > self.threshold.take(nodes)
+            nodes = self.children.take(nodes * 2 + go_right)
+        return self.leaf_proba.take(self.leaf_of.take(nodes), axis=0).mean(axis=0, dtype=np.float64)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
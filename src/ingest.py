@@ -0,0 +1,163 @@
+# src/ingest.py
+"""
+Офлайн-загрузка датасета из записанных видео (без GUI и камеры).
+
+Структура папки:
+    videos/
+        Сәлем/clip1.mp4, clip2.avi, ...
+        Рахмет/seq1/0001.png, 0002.png, ...   (последовательность кадров)
+        Иә/0001.jpg, 0002.jpg, ...            (кадры прямо в папке жеста)
+
+Имя подпапки первого уровня = метка жеста.
+
+Запуск:
+    python -m src.ingest videos/ --workers 4
+"""
+import os
+import sys
+import argparse
+import multiprocessing as mproc
+import numpy as np
+from src.engine import NUM_LANDMARKS, landmarks_to_array, normalize_hands_batch
+from src.config import ANALYSIS_SIZE
+
+VIDEO_EXT = {".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v"}
+IMAGE_EXT = {".png", ".jpg", ".jpeg", ".bmp"}
+
+# Один экземпляр Holistic на процесс-воркер (создается в _init_worker)
+_holistic = None
+_preprocessor = None
+_mirror = True
+
+
+def find_sources(root):
+    """Возвращает список (label, path, kind), kind = 'video' | 'images'"""
+    sources = []
+    for label in sorted(os.listdir(root)):
+        label_dir = os.path.join(root, label)
+        if not os.path.isdir(label_dir):
+            continue
+        loose_images = []
+        for name in sorted(os.listdir(label_dir)):
+            path = os.path.join(label_dir, name)
+            ext = os.path.splitext(name)[1].lower()
+            if os.path.isdir(path):
+                sources.append((label, path, "images"))
+            elif ext in VIDEO_EXT:
+                sources.append((label, path, "video"))
+            elif ext in IMAGE_EXT:
+                loose_images.append(path)
+        if loose_images:
+            sources.append((label, label_dir, "images"))
+    return sources
+
+
+def _iter_frames(path, kind):
+    import cv2
+    if kind == "video":
+        cap = cv2.VideoCapture(path)
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield frame
+        finally:
+            cap.release()
+    else:
+        for name in sorted(os.listdir(path)):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXT:
+                frame = cv2.imread(os.path.join(path, name))
+                if frame is not None:
+                    yield frame
+
+
+def _init_worker(mirror, model_complexity):
+    global _holistic, _preprocessor, _mirror
+    import mediapipe as mp
+    from src.preprocess import FramePreprocessor
+    _mirror = mirror
+    _preprocessor = FramePreprocessor(ANALYSIS_SIZE)  # как в VideoWorker
+    _holistic = mp.solutions.holistic.Holistic(
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5,
+        model_complexity=model_complexity
+    )
+
+
+def _process_source(source):
+    """Воркер: один файл/последовательность -> (label, path, points (N, 2, 21, 3), total_frames)"""
+    label, path, kind = source
+    rows = []
+    total = 0
+    try:
+        for frame in _iter_frames(path, kind):
+            total += 1
+            results = _holistic.process(_preprocessor.process(frame, _mirror))
+
+            left = landmarks_to_array(results.left_hand_landmarks)
+            right = landmarks_to_array(results.right_hand_landmarks)
+            # Как в режиме COLLECT: кадры без рук не пишем
+            if left is None and right is None:
+                continue
+            row = np.zeros((2, NUM_LANDMARKS, 3), dtype=np.float64)
+            if left is not None:
+                row[0] = left
+            if right is not None:
+                row[1] = right
+            rows.append(row)
+    except Exception as e:
+        print(f"[INGEST] {path}: {e}", file=sys.stderr)
+
+    points = np.stack(rows) if rows else np.zeros((0, 2, NUM_LANDMARKS, 3))
+    return label, path, points, total
+
+
+def ingest(root, workers=None, mirror=True, model_complexity=0, dry_run=False):
+    sources = find_sources(root)
+    if not sources:
+        print(f"[INGEST] No labelled videos found in {root}")
+        return 0
+
+    workers = workers or os.cpu_count() or 1
+    print(f"[INGEST] {len(sources)} sources, {workers} workers")
+
+    all_X, all_y, all_src = [], [], []
+    with mproc.Pool(workers, initializer=_init_worker, initargs=(mirror, model_complexity)) as pool:
+        for i, (label, path, points, total) in enumerate(pool.imap_unordered(_process_source, sources), 1):
+            if len(points):
+                all_X.append(normalize_hands_batch(points))
+                all_y.extend([label] * len(points))
+                all_src.append(np.full(len(points), i, dtype=np.int32))  # файл = сессия записи
+            print(f"[INGEST] {i}/{len(sources)} {label}: {len(points)}/{total} frames <- {path}")
+
+    if not all_X:
+        print("[INGEST] No hands detected, nothing to save.")
+        return 0
+
+    X = np.vstack(all_X)
+    if dry_run:
+        print(f"[INGEST] Dry run: {len(X)} samples not saved.")
+        return len(X)
+
+    from src.engine import NeuralEngine
+    count = NeuralEngine().save_dataset(X, all_y, sessions=np.concatenate(all_src))
+    print(f"[INGEST] Saved {count} samples ({len(set(all_y))} gestures).")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk video -> dataset ingestion")
+    parser.add_argument("root", help="Folder with one subfolder per gesture label")
+    parser.add_argument("--workers", type=int, default=None, help="Process count (default: all cores)")
+    parser.add_argument("--no-mirror", action="store_true", help="Do not mirror frames (GUI mirrors by default)")
+    parser.add_argument("--complexity", type=int, default=0, choices=(0, 1, 2), help="Holistic model_complexity")
+    parser.add_argument("--dry-run", action="store_true", help="Extract features without saving")
+    args = parser.parse_args(argv)
+
+    ingest(args.root, workers=args.workers, mirror=not args.no_mirror,
+           model_complexity=args.complexity, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# src/landmarks.py
+import cv2
+import numpy as np
+from src.engine import landmarks_to_array
+
+
+class HandsResult:
+    """
+    Landmarks рук в нормализованных координатах кадра:
+    left / right — массивы (21, 3) или None, если рука не найдена.
+    """
+    __slots__ = ("left", "right", "keyframe")
+
+    def __init__(self, left=None, right=None, keyframe=True):
+        self.left = left
+        self.right = right
+        self.keyframe = keyframe
+
+    def any(self):
+        return self.left is not None or self.right is not None
+
+
+class HolisticBackend:
+    """Полный граф Holistic (поза + лицо + руки), как раньше"""
+    def __init__(self, model_complexity=0):
+        import mediapipe as mp  # ~0.8 с импорта: только при создании бэкенда
+        self.holistic = mp.solutions.holistic.Holistic(
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5,
+            model_complexity=model_complexity
+        )
+
+    def process(self, rgb, mirrored=True):
+        results = self.holistic.process(rgb)
+        return HandsResult(landmarks_to_array(results.left_hand_landmarks),
+                           landmarks_to_array(results.right_hand_landmarks))
+
+    def close(self):
+        self.holistic.close()
+
+
+class HandsBackend:
+    """
+    Только руки (mp.solutions.hands) — заметно легче Holistic.
+    MediaPipe Hands считает вход зеркальным (селфи); для незеркального кадра
+    метки Left/Right меняются местами. Датасет лучше записывать тем же
+    бэкендом, которым потом распознаем.
+    """
+    def __init__(self, model_complexity=0):
+        import mediapipe as mp
+        self.hands = mp.solutions.hands.Hands(
+            max_num_hands=2,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5,
+            model_complexity=min(model_complexity, 1)
+        )
+
+    def process(self, rgb, mirrored=True):
+        results = self.hands.process(rgb)
+        out = HandsResult()
+        if not results.multi_hand_landmarks:
+            return out
+        for lms, handedness in zip(results.multi_hand_landmarks, results.multi_handedness):
+            is_left = handedness.classification[0].label == "Left"
+            if not mirrored:
+                is_left = not is_left
+            if is_left and out.left is None:
+                out.left = landmarks_to_array(lms)
+            elif not is_left and out.right is None:
+                out.right = landmarks_to_array(lms)
+        return out
+
+    def close(self):
+        self.hands.close()
+
+
+def create_backend(name, model_complexity=0):
+    if name == "hands":
+        return HandsBackend(model_complexity)
+    if name == "holistic":
+        return HolisticBackend(model_complexity)
+    raise ValueError(f"Unknown landmark backend: {name}")
+
+
+class KeyframeTracker:
+    """
+    Полная модель только на ключевых кадрах, между ними — дешевый
+    оптический поток (Lucas-Kanade) по точкам рук на уменьшенном кадре.
+
+    Ключевой кадр запускается, если:
+    - прошло interval кадров (interval адаптируется к скорости движения:
+      быстрые руки -> чаще, неподвижные -> до max_interval);
+    - доля успешно отслеженных точек упала ниже min_confidence.
+    max_interval = 1 отключает трекинг (модель на каждом кадре).
+    """
+    LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                     criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+    def __init__(self, backend, max_interval=1, min_confidence=0.8,
+                 motion_low=0.002, motion_high=0.02):
+        self.backend = backend
+        self.max_interval = max(1, int(max_interval))
+        self.min_confidence = min_confidence
+        self.motion_low = motion_low    # доля ширины кадра за кадр
+        self.motion_high = motion_high
+        self.interval = self.max_interval
+        self.since_keyframe = 0
+        self.prev_gray = None
+        self.last = HandsResult()
+
+    def process(self, rgb, mirrored=True):
+        if self.max_interval <= 1:
+            self.last = self.backend.process(rgb, mirrored)
+            return self.last
+
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        result = None
+        if self.prev_gray is not None and self.since_keyframe < self.interval and self.last.any():
+            result = self._track(gray)
+
+        if result is None:
+            result = self.backend.process(rgb, mirrored)
+            # Скорость между ключевыми кадрами (иначе interval=1 не вырастет)
+            self._adapt(self._motion(self.last, result))
+            self.since_keyframe = 0
+        self.since_keyframe += 1
+
+        self.prev_gray = gray
+        self.last = result
+        return result
+
+    def _track(self, gray):
+        """Переносит точки с прошлого кадра. None -> нужен ключевой кадр"""
+        h, w = gray.shape
+        out = HandsResult(keyframe=False)
+        motions = []
+        for side in ("left", "right"):
+            pts = getattr(self.last, side)
+            if pts is None:
+                continue
+            prev_px = (pts[:, :2] * (w, h)).astype(np.float32).reshape(-1, 1, 2)
+            next_px, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, prev_px, None, **self.LK_PARAMS)
+            if next_px is None or status.mean() < self.min_confidence:
+                return None
+            moved = pts.copy()
+            moved[:, :2] = next_px.reshape(-1, 2) / (w, h)
+            setattr(out, side, moved)
+            motions.append(np.median(np.abs(next_px - prev_px)) / w)
+
+        self._adapt(max(motions) if motions else 0.0)
+        return out
+
+    @staticmethod
+    def _motion(a, b):
+        """Медианное смещение точек между двумя результатами (доля ширины кадра)"""
+        motions = [np.median(np.abs(getattr(b, side)[:, :2] - getattr(a, side)[:, :2]))
+                   for side in ("left", "right")
+                   if getattr(a, side) is not None and getattr(b, side) is not None]
+        return max(motions) if motions else 0.0
+
+    def _adapt(self, motion):
+        """Интервал между ключевыми кадрами от скорости рук"""
+        if motion >= self.motion_high:
+            self.interval = 1
+        elif motion <= self.motion_low:
+            self.interval = self.max_interval
+        else:
+            k = (self.motion_high - motion) / (self.motion_high - self.motion_low)
+            self.interval = max(1, int(round(1 + k * (self.max_interval - 1))))
+
+    def set_max_interval(self, max_interval):
+        """Потолок интервала ключевых кадров (контроллер качества)"""
+        self.max_interval = max(1, int(max_interval))
+        self.interval = min(self.interval, self.max_interval)
+
+    def set_backend(self, backend):
+        """Другая модель (например, иной сложности). Возвращает старую — закрыть после смены"""
+        old, self.backend = self.backend, backend
+        self.reset()
+        return old
+
+    def reset(self):
+        """Следующий кадр — ключевой (сменился размер кадра или модель)"""
+        self.since_keyframe = 0
+        self.prev_gray = None
+        self.last = HandsResult()
+
+    def close(self):
+        self.backend.close()
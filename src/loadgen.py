@@ -0,0 +1,75 @@
+# src/loadgen.py
+"""
+Генератор нагрузки для src.server: N параллельных клиентов шлют кадры
+landmarks с заданной частотой и меряют задержку ответа.
+
+    python -m src.loadgen --clients 32 --fps 30 --seconds 20
+"""
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+from src.benchmark import synthetic_landmarks, summarize
+from src.config import SERVER_HOST, SERVER_PORT
+
+
+async def run_client(idx, host, port, fps, seconds, stream, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port, limit=2 ** 22)
+    period = 1.0 / fps if fps > 0 else 0.0
+    client = f"load-{idx}"
+    deadline = time.perf_counter() + seconds
+    next_send = time.perf_counter()
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            points = stream[(i + idx * 97) % len(stream)]
+            hands = [p.tolist() if p.any() else None for p in points]
+            msg = {"id": i, "client": client, "landmarks": hands}
+            t0 = time.perf_counter_ns()
+            writer.write((json.dumps(msg) + "\n").encode("utf-8"))
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            latencies.append(time.perf_counter_ns() - t0)
+            if "error" in reply:
+                errors.append(reply["error"])
+            i += 1
+            next_send += period
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                next_send = time.perf_counter()
+    finally:
+        writer.close()
+
+
+async def run(args):
+    stream = synthetic_landmarks(2000)
+    latencies, errors = [], []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(run_client(i, args.host, args.port, args.fps, args.seconds,
+                                      stream, latencies, errors) for i in range(args.clients)))
+    elapsed = time.perf_counter() - t0
+    stats = summarize(latencies)
+    print(f"[LOADGEN] {args.clients} clients x {args.fps} fps for {elapsed:.1f} s")
+    print(f"  requests: {stats.get('n', 0)}  ({stats.get('n', 0) / elapsed:.0f} req/s), errors: {len(errors)}")
+    if stats.get("n"):
+        print(f"  latency ms: p50 {stats['p50_us'] / 1000:.2f}  p95 {stats['p95_us'] / 1000:.2f}  "
+              f"p99 {stats['p99_us'] / 1000:.2f}  max {stats['max_us'] / 1000:.2f}")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for the recognition server")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--fps", type=float, default=30.0, help="Frames per second per client (0 = as fast as possible)")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,56 @@
 # src/main_window.py
 import os
-import cv2
-import numpy as np
+import time
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QLabel, QPushButton, QLineEdit, QGroupBox, 
                              QTextEdit, QProgressBar, QTabWidget, QComboBox, 
                              QCheckBox, QApplication, QInputDialog, QMessageBox, QSlider)
-from PyQt6.QtCore import Qt, pyqtSlot
+from PyQt6.QtCore import Qt, pyqtSlot, QTimer
 from PyQt6.QtGui import QImage, QPixmap
-from src.thread_worker import VideoWorker
-from src.config import TRANSLATIONS
+from src.thread_worker import VideoWorker, TrainWorker
+from src.config import TRANSLATIONS, RETRAIN_DELAY_MS, SEQUENCE_MODE, TELEMETRY_EXPORT_SEC, DISPLAY_SIZE
+from src.telemetry import format_snapshot
+from src.startup import startup
+
+def load_stylesheet():
+    """Тема из ui_style.qss рядом с модулем (или пустая строка)"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ui_style.qss")
+    if not os.path.exists(path):
+        return ""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def rgb_to_pixmap(rgb):
+    """Готовый RGB кадр (уже под размер панели) -> QPixmap, одна копия"""
+    h, w, ch = rgb.shape
+    qt_img = QImage(rgb.data, w, h, ch * w, QImage.Format.Format_RGB888)
+    return QPixmap.fromImage(qt_img)
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.lang_code = "RU"
         self.worker = None
+        self.train_job = None
+
+        # Отложенное переобучение: несколько удалений подряд -> одно обучение
+        self.retrain_timer = QTimer(self)
+        self.retrain_timer.setSingleShot(True)
+        self.retrain_timer.setInterval(RETRAIN_DELAY_MS)
+        self.retrain_timer.timeout.connect(self.on_retrain_due)
         
         self.resize(1300, 900)
         self.load_css()
         self.build_ui()
+        self.set_controls_enabled(False)  # до конца прогрева модели
         self.start_camera()
 
     def load_css(self):
-        base = os.path.dirname(os.path.abspath(__file__))
-        path = os.path.join(base, "ui_style.qss")
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                self.setStyleSheet(f.read())
+        css = load_stylesheet()
+        if css:
+            self.setStyleSheet(css)
 
     def build_ui(self):
         self.central = QWidget()
@@ -67,7 +90,7 @@ class MainWindow(QMainWindow):
         cam_layout = QVBoxLayout()
         
         self.video_lbl = QLabel()
-        self.video_lbl.setFixedSize(850, 600)
+        self.video_lbl.setFixedSize(*DISPLAY_SIZE)
         self.video_lbl.setStyleSheet("background: #000; border-radius: 10px;")
         
         self.res_lbl = QLabel("READY")
@@ -81,6 +104,10 @@ class MainWindow(QMainWindow):
         cam_layout.addWidget(self.video_lbl)
         cam_layout.addWidget(self.conf_bar)
         cam_layout.addWidget(self.res_lbl)
+        # Текущая ступень адаптивного качества (обновляется с телеметрией)
+        self.quality_lbl = QLabel("")
+        self.quality_lbl.setStyleSheet("color: #666; font-size: 11px;")
+        cam_layout.addWidget(self.quality_lbl)
         self.grp_cam.setLayout(cam_layout)
         left_col.addWidget(self.grp_cam)
         
@@ -101,6 +128,11 @@ class MainWindow(QMainWindow):
         
         self.btn_train = QPushButton("TRAIN")
         self.btn_train.clicked.connect(self.on_train)
+
+        self.train_bar = QProgressBar()
+        self.train_bar.setFixedHeight(8)
+        self.train_bar.setTextVisible(False)
+        self.train_bar.hide()
         
         self.btn_delete = QPushButton("DELETE")
         self.btn_delete.setStyleSheet("color: #FF1744;")
@@ -114,6 +146,7 @@ class MainWindow(QMainWindow):
         ctrl_layout.addWidget(self.btn_rec)
         ctrl_layout.addWidget(self.btn_save)
         ctrl_layout.addWidget(self.btn_train)
+        ctrl_layout.addWidget(self.train_bar)
         ctrl_layout.addWidget(self.btn_delete)
         ctrl_layout.addWidget(self.log_box)
         self.grp_ctrl.setLayout(ctrl_layout)
@@ -132,6 +165,11 @@ class MainWindow(QMainWindow):
         self.chk_mirror.stateChanged.connect(self.on_mirror_change)
         
         layout.addWidget(self.chk_mirror)
+
+        self.chk_sequence = QCheckBox("Sequence Mode")
+        self.chk_sequence.setChecked(SEQUENCE_MODE)
+        self.chk_sequence.stateChanged.connect(self.on_sequence_change)
+        layout.addWidget(self.chk_sequence)
         
         layout.addWidget(QLabel("LIGHT BOOST:"))
         self.boost_slider = QSlider(Qt.Orientation.Horizontal)
@@ -139,6 +177,29 @@ class MainWindow(QMainWindow):
         self.boost_slider.setValue(10)
         self.boost_slider.valueChanged.connect(self.on_boost_change)
         layout.addWidget(self.boost_slider)
+
+        # --- ТЕЛЕМЕТРИЯ ---
+        self.lbl_telemetry = QLabel("TELEMETRY:")
+        layout.addWidget(self.lbl_telemetry)
+        self.telemetry_box = QTextEdit()
+        self.telemetry_box.setReadOnly(True)
+        self.telemetry_box.setStyleSheet("font-family: Consolas, monospace; font-size: 12px;")
+        layout.addWidget(self.telemetry_box)
+
+        tel_row = QHBoxLayout()
+        self.chk_trace = QCheckBox("Detailed per-frame trace")
+        self.chk_trace.stateChanged.connect(self.on_trace_change)
+        self.btn_export = QPushButton("EXPORT")
+        self.btn_export.clicked.connect(self.on_export_telemetry)
+        tel_row.addWidget(self.chk_trace)
+        tel_row.addStretch()
+        tel_row.addWidget(self.btn_export)
+        layout.addLayout(tel_row)
+
+        self.telemetry_timer = QTimer(self)
+        self.telemetry_timer.timeout.connect(self.refresh_telemetry)
+        self.telemetry_timer.start(1000)
+        self.last_export = time.monotonic()
         
         layout.addStretch()
         self.tabs.addTab(self.tab_sett, "SETTINGS")
@@ -151,8 +212,15 @@ class MainWindow(QMainWindow):
         self.grp_ctrl.setTitle(t["grp_control"])
         self.input_lbl.setText(t["lbl_input"])
         self.btn_save.setText(t["btn_save"])
-        self.btn_train.setText(t.get("btn_train", "TRAIN")) # На случай если нет в конфиге
+        if self.is_training():
+            self.btn_train.setText(t.get("btn_train_cancel", "CANCEL"))
+        else:
+            self.btn_train.setText(t.get("btn_train", "TRAIN")) # На случай если нет в конфиге
         self.chk_mirror.setText(t["lbl_mirror"])
+        self.lbl_telemetry.setText(t.get("lbl_telemetry", "TELEMETRY:"))
+        self.chk_trace.setText(t.get("lbl_trace", "Detailed per-frame trace"))
+        self.btn_export.setText(t.get("btn_export", "EXPORT"))
+        self.chk_sequence.setText(t.get("lbl_sequence", "Sequence Mode"))
         
         if self.btn_rec.isChecked():
             self.btn_rec.setText(t["btn_record_release"])
@@ -162,12 +230,34 @@ class MainWindow(QMainWindow):
         self.tabs.setTabText(0, t.get("tab_main", "TERMINAL"))
         self.tabs.setTabText(1, t.get("tab_settings", "SETTINGS"))
 
+    def set_controls_enabled(self, enabled):
+        """Кнопки, которым нужна модель (NeuralEngine грузится в фоне)"""
+        for w in (self.btn_rec, self.btn_save, self.btn_train, self.btn_delete, self.chk_sequence):
+            w.setEnabled(enabled)
+
     def start_camera(self):
         self.worker = VideoWorker()
-        self.worker.frame_signal.connect(self.draw_frame)
-        self.worker.data_signal.connect(self.update_data)
+        self.worker.ready_signal.connect(self.on_worker_ready)
         self.worker.start()
 
+        # Перерисовка с частотой экрана: только самый свежий кадр, лишние склеиваются
+        screen = QApplication.primaryScreen()
+        refresh = screen.refreshRate() if screen is not None else 60.0
+        self.shown_data = None
+        self.display_timer = QTimer(self)
+        self.display_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.display_timer.timeout.connect(self.draw_frame)
+        self.display_timer.start(max(1, int(1000 / max(refresh, 1.0))))
+
+    @pyqtSlot()
+    def on_worker_ready(self):
+        self.set_controls_enabled(True)
+        snap = startup.snapshot()
+        for name, ms in {**snap["marks_ms"], **snap["steps_ms"]}.items():
+            self.worker.telemetry.gauge(f"startup_{name}_ms", ms)
+        print(f"[STARTUP]\n{startup.report()}")
+        self.log(f"Ready in {snap['marks_ms'].get('ready', 0) / 1000:.1f} s")
+
     def set_language(self, lang):
         self.lang_code = lang
         self.update_texts()
@@ -199,28 +289,116 @@ class MainWindow(QMainWindow):
     def on_save(self):
         cnt = self.worker.save_data()
         self.log(f"Saved: +{cnt}")
+        if cnt:
+            # Новые кадры уже распознаются по прототипам; лес переобучится в фоне
+            self.retrain_timer.start()
+
+    def is_training(self):
+        return self.train_job is not None and self.train_job.isRunning()
 
     def on_train(self):
+        # Повторное нажатие во время обучения = отмена
+        if self.is_training():
+            self.train_job.cancel()
+            self.log("Cancelling...")
+            return
+        self.start_training()
+
+    def start_training(self, only_if_dirty=False):
+        if self.is_training():
+            return
         self.log("Training...")
-        QApplication.processEvents()
-        ok, msg = self.worker.train_model()
+        self.train_job = TrainWorker(self.worker.engine, only_if_dirty=only_if_dirty,
+                                     with_sequence=self.worker.sequence_mode)
+        self.train_job.progress_signal.connect(self.on_train_progress)
+        self.train_job.done_signal.connect(self.on_train_done)
+        # done_signal приходит изнутри run(): поток еще isRunning(), кнопку сбрасываем по finished
+        self.train_job.finished.connect(self.on_train_finished)
+        self.train_bar.setValue(0)
+        self.train_bar.show()
+        self.train_job.start()
+        self.update_texts()
+
+    @pyqtSlot(int, int)
+    def on_train_progress(self, done, total):
+        self.train_bar.setValue(int(done * 100 / max(total, 1)))
+
+    @pyqtSlot(bool, str)
+    def on_train_done(self, ok, msg):
         self.log(f"Result: {msg}")
 
+    @pyqtSlot()
+    def on_train_finished(self):
+        self.train_bar.hide()
+        self.update_texts()
+
     def on_delete_gesture(self):
         label, ok = QInputDialog.getText(self, "Delete", "Gesture Name:")
         if ok and label:
             success, msg = self.worker.engine.remove_label(label)
+            if success:
+                self.retrain_timer.start()  # перезапуск таймера при каждом удалении
             QMessageBox.information(self, "Status", msg)
 
+    def on_retrain_due(self):
+        if not self.worker.engine.dirty:
+            return
+        if self.is_training():
+            # Дождемся текущего обучения и проверим снова
+            self.retrain_timer.start()
+            return
+        self.start_training(only_if_dirty=True)
+
     def on_mirror_change(self, state):
         self.worker.mirror = (state == 2)
 
-    @pyqtSlot(np.ndarray)
-    def draw_frame(self, frame):
-        h, w, ch = frame.shape
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        qt_img = QImage(rgb.data, w, h, ch * w, QImage.Format.Format_RGB888)
-        self.video_lbl.setPixmap(QPixmap.fromImage(qt_img).scaled(850, 600, Qt.AspectRatioMode.KeepAspectRatio))
+    def on_sequence_change(self, state):
+        self.worker.sequence_mode = (state == 2)
+        self.worker.seq_ring.reset()
+        if self.worker.sequence_mode and self.worker.engine.seq_fast is None:
+            self.log("Sequence model not trained yet: press TRAIN.")
+
+    def draw_frame(self):
+        """Тик таймера экрана: свежий кадр и текст результата, если изменились"""
+        data = self.worker.latest_data
+        if data != self.shown_data:
+            self.shown_data = data
+            self.update_data(*data)
+
+        display = self.worker.display
+        rgb = display.acquire()
+        if rgb is None:
+            return
+        tel = self.worker.telemetry
+        t0 = time.perf_counter_ns()
+        try:
+            tel.record("gui_wait", t0 - display.published_ns)
+            self.video_lbl.setPixmap(rgb_to_pixmap(rgb))
+        finally:
+            display.release()
+        startup.mark("first_paint")
+        t1 = time.perf_counter_ns()
+        tel.record("gui_draw", t1 - t0)
+        tel.fps("display").tick(t1)
+
+    def refresh_telemetry(self):
+        if self.worker is None:
+            return
+        t = TRANSLATIONS.get(self.lang_code, TRANSLATIONS["RU"])
+        self.quality_lbl.setText(f"{t.get('lbl_quality', 'Quality')}: {self.worker.quality.describe()}")
+        if self.tabs.currentWidget() is self.tab_sett:
+            self.telemetry_box.setPlainText(format_snapshot(self.worker.telemetry.snapshot()))
+        # Периодический снимок в ротируемый файл
+        if time.monotonic() - self.last_export >= TELEMETRY_EXPORT_SEC:
+            self.last_export = time.monotonic()
+            self.worker.telemetry.export()
+
+    def on_trace_change(self, state):
+        self.worker.telemetry.trace_enabled = (state == 2)
+
+    def on_export_telemetry(self):
+        path = self.worker.telemetry.export()
+        self.log(f"Telemetry -> {path}")
 
     @pyqtSlot(str, float, str)
     def update_data(self, text, conf, mode):
@@ -228,6 +406,10 @@ class MainWindow(QMainWindow):
         if mode == "COLLECT":
             self.res_lbl.setText(text)
             self.res_lbl.setStyleSheet("color: #FF1744; border: 2px solid #FF1744;")
+        elif mode == "WARMUP":
+            self.res_lbl.setText(t.get("status_warmup", "WARMING UP..."))
+            self.res_lbl.setStyleSheet("color: #FFC400; border: 2px solid #333;")
+            self.conf_bar.setValue(0)
         else:
             if text == "..." or conf < 0.6:
                 self.res_lbl.setText(t["status_ready"])
@@ -242,5 +424,8 @@ class MainWindow(QMainWindow):
         self.log_box.append(f">> {text}")
 
     def closeEvent(self, event):
+        if self.is_training():
+            self.train_job.cancel()
+            self.train_job.wait()
         self.worker.stop()
         event.accept()
\ No newline at end of file
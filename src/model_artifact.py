@@ -0,0 +1,142 @@
+# src/model_artifact.py
+"""
+Файл модели без pickle: JSON-заголовок + выровненные NumPy-массивы.
+
+    MAGIC(4) | version u32 | header_len u32 | header JSON | pad | arrays...
+
+Массивы читаются через mmap только для чтения: несколько процессов
+(окно, сервер, ingest) делят одни и те же страницы файла, загрузка не
+копирует данные. В заголовке — метаданные (схема признаков, классы) и
+sha256 всей области массивов, которая проверяется при загрузке.
+
+Файлы версионируются (<name>-000012.ffm): новый файл никогда не
+перезаписывает отображенный в память (на Windows это запрещено),
+текущей считается последняя версия, старые удаляются при сохранении.
+"""
+import os
+import re
+import json
+import mmap
+import struct
+import hashlib
+import numpy as np
+
+MAGIC = b"SLFF"
+FORMAT_VERSION = 1
+ALIGN = 64
+EXT = ".ffm"
+
+
+class ModelFormatError(ValueError):
+    """Файл модели поврежден или несовместим с текущим кодом"""
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def save_artifact(path, arrays, meta):
+    """arrays: {name: ndarray}, meta: JSON-совместимый dict. Запись атомарная (tmp + os.replace)"""
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        arrays[name] = arr
+        layout[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset = _align(offset + arr.nbytes)
+
+    digest = hashlib.sha256()
+    chunks = []
+    pos = 0
+    for name, arr in arrays.items():
+        pad = layout[name]["offset"] - pos
+        for chunk in (b"\0" * pad, arr.tobytes()):
+            digest.update(chunk)
+            chunks.append(chunk)
+        pos = layout[name]["offset"] + arr.nbytes
+
+    header = dict(meta, format_version=FORMAT_VERSION, arrays=layout, sha256=digest.hexdigest())
+    head = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    prefix = len(MAGIC) + 8
+    head += b" " * (_align(prefix + len(head)) - prefix - len(head))
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<II", FORMAT_VERSION, len(head)) + head)
+        for chunk in chunks:
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def load_artifact(path, verify=True):
+    """-> (arrays, meta). Массивы — read-only представления общего mmap"""
+    with open(path, "rb") as f:
+        prefix = f.read(len(MAGIC) + 8)
+        if len(prefix) < len(MAGIC) + 8 or prefix[:len(MAGIC)] != MAGIC:
+            raise ModelFormatError(f"{path}: not a model artifact")
+        version, head_len = struct.unpack("<II", prefix[len(MAGIC):])
+        if version > FORMAT_VERSION:
+            raise ModelFormatError(f"{path}: format v{version} is newer than supported v{FORMAT_VERSION}")
+        try:
+            meta = json.loads(f.read(head_len).decode("utf-8"))
+        except ValueError as e:
+            raise ModelFormatError(f"{path}: bad header ({e})")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    base = len(prefix) + head_len
+    if verify:
+        digest = hashlib.sha256()
+        step = 1 << 22
+        for pos in range(base, len(mm), step):
+            digest.update(mm[pos:min(pos + step, len(mm))])
+        if digest.hexdigest() != meta.get("sha256"):
+            raise ModelFormatError(f"{path}: checksum mismatch")
+
+    arrays = {}
+    for name, spec in meta.pop("arrays").items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = base + spec["offset"]
+        if start + count * dtype.itemsize > len(mm):
+            raise ModelFormatError(f"{path}: array '{name}' is truncated")
+        arrays[name] = np.frombuffer(mm, dtype=dtype, count=count, offset=start).reshape(spec["shape"])
+    return arrays, meta
+
+
+def _versions(directory, name):
+    pattern = re.compile(re.escape(name) + r"-(\d+)" + re.escape(EXT) + "$")
+    found = []
+    if os.path.isdir(directory):
+        for fname in os.listdir(directory):
+            m = pattern.match(fname)
+            if m:
+                found.append((int(m.group(1)), os.path.join(directory, fname)))
+    return sorted(found)
+
+
+def list_artifacts(directory, name):
+    """Пути версий, от старой к новой"""
+    return [path for _, path in _versions(directory, name)]
+
+
+def latest_artifact(directory, name):
+    versions = _versions(directory, name)
+    return versions[-1][1] if versions else None
+
+
+def next_artifact_path(directory, name):
+    versions = _versions(directory, name)
+    n = versions[-1][0] + 1 if versions else 1
+    return os.path.join(directory, f"{name}-{n:06d}{EXT}")
+
+
+def prune_artifacts(directory, name, keep=2):
+    """Удаляет старые версии; занятые (отображенные другим процессом) пропускаются"""
+    for _, path in _versions(directory, name)[:-keep]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,212 @@
+# src/multi_stream.py
+import os
+import cv2
+import time
+import threading
+import numpy as np
+from PyQt6.QtCore import QThread
+from src.engine import NeuralEngine, normalize_points
+from src.landmarks import create_backend
+from src.pipeline import LatestSlot, FramePacer, BufferPool
+from src.preprocess import FramePreprocessor
+from src.voting import MajorityVote
+from src.telemetry import Telemetry
+from src.display import DisplayFrames
+from src.overlay import draw_skeleton
+from src.config import (FRAME_WIDTH, FRAME_HEIGHT, FPS_LIMIT, LANDMARK_BACKEND,
+                        MULTI_LANDMARK_WORKERS, TELEMETRY_DIR)
+
+
+def parse_source(source):
+    """"0" / 0 -> индекс камеры, иначе путь к видео"""
+    if isinstance(source, int):
+        return source
+    return int(source) if str(source).isdigit() else str(source)
+
+
+class StreamSource:
+    """
+    Один источник: камера или видео-файл (крутится по кругу вместо камеры).
+    У каждого потока свои очереди, голосование и кадры для GUI;
+    модель и landmark-воркеры общие.
+    """
+    def __init__(self, index, source, cell_size, mirror=True):
+        self.index = index
+        self.source = parse_source(source)
+        self.is_file = isinstance(self.source, str)
+        self.name = f"{index}:{os.path.basename(self.source)}" if self.is_file else f"cam{self.source}"
+        self.mirror = mirror
+        self.frame_pool = BufferPool()
+        release = lambda item: self.frame_pool.release(item[0])
+        self.capture_slot = LatestSlot(on_drop=release)
+        self.result_slot = LatestSlot(on_drop=release)
+        self.votes = MajorityVote(maxlen=10, threshold=0.65)
+        self.display = DisplayFrames(*cell_size)
+        self.latest_data = ("...", 0.0, "PREDICT")
+
+    def open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not self.is_file:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+        return cap
+
+    def fps(self, cap):
+        """Видео проигрывается в своем темпе, камеры — не чаще FPS_LIMIT"""
+        if self.is_file:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            if fps and fps > 0:
+                return min(fps, FPS_LIMIT)
+        return FPS_LIMIT
+
+    def close(self):
+        self.capture_slot.close()
+        self.result_slot.close()
+
+
+class MultiStreamWorker(QThread):
+    """
+    Несколько камер на одной модели:
+    захват (поток на камеру) -> пул landmark-воркеров -> один пакетный
+    predict_batch на все камеры сразу -> голосование/отрисовка по камерам.
+
+    Пул ограничен: n_workers потоков, у каждого свой граф MediaPipe и
+    закрепленные камеры (i % n_workers). При n_workers == числу камер у
+    каждой камеры свой граф и трекинг MediaPipe не прерывается; если
+    воркеров меньше, граф чередует кадры своих камер и чаще ищет руки заново.
+    """
+    def __init__(self, sources, cell_size, n_workers=MULTI_LANDMARK_WORKERS, engine=None):
+        super().__init__()
+        self.running = True
+        self.engine = engine  # None -> NeuralEngine грузится в run(), окно не ждет
+        self.telemetry = Telemetry(target_fps=FPS_LIMIT, log_dir=TELEMETRY_DIR)
+        self.streams = [StreamSource(i, s, cell_size) for i, s in enumerate(sources)]
+        n = n_workers or os.cpu_count() or 1
+        self.n_workers = max(1, min(n, len(self.streams)))
+        self._wake = [threading.Event() for _ in range(self.n_workers)]
+        self._results_ready = threading.Event()
+
+    def set_mirror(self, mirror):
+        for s in self.streams:
+            s.mirror = mirror
+
+    def run(self):
+        if self.engine is None:
+            self.engine = NeuralEngine()
+        caps = [s.open() for s in self.streams]
+        threads = [threading.Thread(target=self._capture_loop, args=(s, cap, self._wake[s.index % self.n_workers]),
+                                    name=f"capture-{s.name}", daemon=True)
+                   for s, cap in zip(self.streams, caps)]
+        threads += [threading.Thread(target=self._landmark_loop, args=(k,), name=f"landmarks-{k}", daemon=True)
+                    for k in range(self.n_workers)]
+        for t in threads:
+            t.start()
+        try:
+            self._classify_loop()
+        finally:
+            for s in self.streams:
+                s.close()
+            for e in self._wake:
+                e.set()
+            for t in threads:
+                t.join(timeout=2.0)
+            for cap in caps:
+                cap.release()
+
+    def _capture_loop(self, stream, cap, wake):
+        """Стадия 1 (на камеру): чтение кадра в буфер пула, видео-файл перематывается в начало"""
+        pacer = FramePacer(stream.fps(cap))
+        tel = self.telemetry
+        pool = stream.frame_pool
+        while self.running:
+            t0 = time.perf_counter_ns()
+            buf = pool.acquire()
+            ret, frame = cap.read(buf)
+            if not ret:
+                pool.release(buf)
+                if stream.is_file:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                tel.count(f"capture_fail_{stream.name}")
+                time.sleep(0.005)
+                continue
+            frame = pool.adopt(frame, buf)
+            t1 = time.perf_counter_ns()
+            tel.record("capture", t1 - t0)
+            tel.fps(stream.name).tick(t1)
+            stream.capture_slot.put((frame, t1, stream.mirror))
+            wake.set()
+            pacer.wait()
+
+    def _landmark_loop(self, k):
+        """Стадия 2 (пул): landmarks для закрепленных камер, свежий кадр каждой"""
+        backend = create_backend(LANDMARK_BACKEND, model_complexity=0)
+        preprocessor = FramePreprocessor()  # камеры воркера обрабатываются по очереди
+        streams = self.streams[k::self.n_workers]
+        wake = self._wake[k]
+        tel = self.telemetry
+        try:
+            while self.running:
+                wake.wait(0.1)
+                wake.clear()
+                for stream in streams:
+                    item = stream.capture_slot.get(timeout=0)
+                    if item is None:
+                        continue
+                    frame, t_capture, mirror = item
+                    t0 = time.perf_counter_ns()
+                    rgb_small = preprocessor.process(frame, mirror)
+                    hands = backend.process(rgb_small, mirrored=mirror)
+                    features = np.concatenate((normalize_points(hands.left), normalize_points(hands.right)))
+                    tel.record("landmarks", time.perf_counter_ns() - t0)
+                    stream.result_slot.put((frame, hands, features, t_capture, mirror))
+                    self._results_ready.set()
+        finally:
+            backend.close()
+
+    def _classify_loop(self):
+        """Стадия 3: один predict_batch на свежие кадры всех камер"""
+        tel = self.telemetry
+        while self.running:
+            self._results_ready.wait(0.1)
+            self._results_ready.clear()
+            batch = []
+            for stream in self.streams:
+                item = stream.result_slot.get(timeout=0)
+                if item is not None:
+                    batch.append((stream, item))
+            if not batch:
+                continue
+
+            t0 = time.perf_counter_ns()
+            with_hands = [i for i, (_, item) in enumerate(batch) if item[2].any()]
+            labels, confs = {}, {}
+            if with_hands:
+                X = np.stack([batch[i][1][2] for i in with_hands])
+                res_labels, res_confs = self.engine.predict_batch(X)
+                labels = dict(zip(with_hands, res_labels))
+                confs = dict(zip(with_hands, res_confs))
+            t1 = time.perf_counter_ns()
+            tel.record("classify_batch", t1 - t0)
+            tel.gauge("batch_size", len(with_hands))
+
+            for i, (stream, (frame, hands, features, t_capture, mirror)) in enumerate(batch):
+                if i in labels:
+                    status_text = stream.votes.push(labels[i], confs[i])
+                    conf = confs[i]
+                else:
+                    stream.votes.push_empty()
+                    status_text, conf = "...", 0.0
+                canvas = stream.display.begin(frame, mirror)
+                stream.frame_pool.release(frame)
+                draw_skeleton(canvas, hands)
+                stream.display.commit()
+                stream.latest_data = (str(status_text), float(conf), "PREDICT")
+                tel.record("end_to_end", time.perf_counter_ns() - t_capture)
+            tel.record("render", time.perf_counter_ns() - t1)
+            tel.fps("render").tick()
+            tel.gauge("dropped_capture", sum(s.capture_slot.dropped for s in self.streams))
+            tel.gauge("dropped_result", sum(s.result_slot.dropped for s in self.streams))
+
+    def stop(self):
+        self.running = False
+        self.wait()
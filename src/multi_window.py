@@ -0,0 +1,167 @@
+# src/multi_window.py
+import math
+import time
+from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
+                             QLabel, QGroupBox, QComboBox, QCheckBox, QProgressBar, QApplication)
+from PyQt6.QtCore import Qt, QTimer
+from src.multi_stream import MultiStreamWorker
+from src.main_window import rgb_to_pixmap, load_stylesheet
+from src.config import TRANSLATIONS, MULTI_GRID_SIZE, TELEMETRY_EXPORT_SEC
+
+
+def grid_shape(n):
+    """Число камер -> (строки, столбцы), ближе к квадрату"""
+    cols = max(1, math.ceil(math.sqrt(n)))
+    return math.ceil(n / cols), cols
+
+
+class StreamCell(QWidget):
+    """Ячейка сетки: видео + результат одной камеры"""
+    def __init__(self, name, cell_size):
+        super().__init__()
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        self.name_lbl = QLabel(name)
+        self.video_lbl = QLabel()
+        self.video_lbl.setFixedSize(*cell_size)
+        self.video_lbl.setStyleSheet("background: #000; border-radius: 10px;")
+
+        self.conf_bar = QProgressBar()
+        self.conf_bar.setFixedHeight(8)
+        self.conf_bar.setTextVisible(False)
+
+        self.res_lbl = QLabel("...")
+        self.res_lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.res_lbl.setFixedHeight(40)
+
+        layout.addWidget(self.name_lbl)
+        layout.addWidget(self.video_lbl)
+        layout.addWidget(self.conf_bar)
+        layout.addWidget(self.res_lbl)
+        self.shown_data = None
+
+    def update_data(self, text, conf, ready_text):
+        if text == "..." or conf < 0.6:
+            self.res_lbl.setText(ready_text)
+            self.res_lbl.setStyleSheet("font-size: 18px; color: #444; border: 2px solid #222;")
+            self.conf_bar.setValue(0)
+        else:
+            self.res_lbl.setText(f"{text.upper()} ({int(conf*100)}%)")
+            self.res_lbl.setStyleSheet("font-size: 18px; color: #00E5FF; border: 2px solid #00E5FF;")
+            self.conf_bar.setValue(int(conf * 100))
+
+
+class MultiStreamWindow(QMainWindow):
+    """
+    Окно нескольких камер: сетка видео, одна общая модель.
+    Только распознавание — запись жестов и обучение в обычном окне.
+    """
+    def __init__(self, sources):
+        super().__init__()
+        self.lang_code = "RU"
+        rows, cols = grid_shape(len(sources))
+        gw, gh = MULTI_GRID_SIZE
+        self.cell_size = (gw // cols - 12, gh // rows - 90)
+        self.worker = MultiStreamWorker(sources, self.cell_size)
+
+        self.resize(gw + 60, gh + 200)
+        self.setStyleSheet(load_stylesheet())
+        self.build_ui(rows, cols)
+        self.start_streams()
+
+    def build_ui(self, rows, cols):
+        central = QWidget()
+        self.setCentralWidget(central)
+        main_layout = QVBoxLayout(central)
+
+        top_bar = QHBoxLayout()
+        title = QLabel("NEURAL GESTURE PRO")
+        title.setStyleSheet("font-size: 22px; font-weight: 900; color: #00E5FF;")
+        self.chk_mirror = QCheckBox("Mirror Mode")
+        self.chk_mirror.setChecked(True)
+        self.chk_mirror.stateChanged.connect(lambda state: self.worker.set_mirror(state == 2))
+        self.lang_box = QComboBox()
+        self.lang_box.addItems(["RU", "KZ", "EN"])
+        self.lang_box.currentTextChanged.connect(self.set_language)
+        top_bar.addWidget(title)
+        top_bar.addStretch()
+        top_bar.addWidget(self.chk_mirror)
+        top_bar.addWidget(QLabel("LNG:"))
+        top_bar.addWidget(self.lang_box)
+        main_layout.addLayout(top_bar)
+
+        self.grp_streams = QGroupBox("CAMERAS")
+        grid = QGridLayout()
+        self.cells = []
+        for i, stream in enumerate(self.worker.streams):
+            cell = StreamCell(stream.name, self.cell_size)
+            grid.addWidget(cell, i // cols, i % cols)
+            self.cells.append(cell)
+        self.grp_streams.setLayout(grid)
+        main_layout.addWidget(self.grp_streams)
+
+        self.status_lbl = QLabel("")
+        self.status_lbl.setStyleSheet("font-family: Consolas, monospace; font-size: 12px; color: #888;")
+        main_layout.addWidget(self.status_lbl)
+        self.update_texts()
+
+    def update_texts(self):
+        t = TRANSLATIONS.get(self.lang_code, TRANSLATIONS["RU"])
+        self.setWindowTitle(t["window_title"])
+        self.grp_streams.setTitle(t.get("grp_streams", "CAMERAS"))
+        self.chk_mirror.setText(t["lbl_mirror"])
+        for cell in self.cells:
+            cell.shown_data = None  # перерисовать текст на новом языке
+
+    def set_language(self, lang):
+        self.lang_code = lang
+        self.update_texts()
+
+    def start_streams(self):
+        self.worker.start()
+        screen = QApplication.primaryScreen()
+        refresh = screen.refreshRate() if screen is not None else 60.0
+        self.display_timer = QTimer(self)
+        self.display_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.display_timer.timeout.connect(self.draw_frames)
+        self.display_timer.start(max(1, int(1000 / max(refresh, 1.0))))
+
+        self.last_export = time.monotonic()
+        self.status_timer = QTimer(self)
+        self.status_timer.timeout.connect(self.refresh_status)
+        self.status_timer.start(1000)
+
+    def draw_frames(self):
+        """Тик таймера экрана: свежие кадры всех камер"""
+        ready = TRANSLATIONS[self.lang_code]["status_ready"]
+        tel = self.worker.telemetry
+        for stream, cell in zip(self.worker.streams, self.cells):
+            data = stream.latest_data
+            if data != cell.shown_data:
+                cell.shown_data = data
+                cell.update_data(data[0], data[1], ready)
+
+            rgb = stream.display.acquire()
+            if rgb is None:
+                continue
+            try:
+                cell.video_lbl.setPixmap(rgb_to_pixmap(rgb))
+            finally:
+                stream.display.release()
+            tel.fps(f"display_{stream.name}").tick()
+
+    def refresh_status(self):
+        snap = self.worker.telemetry.snapshot()
+        fps = "  ".join(f"{s.name}: {snap['fps'].get(s.name, 0.0):.0f}" for s in self.worker.streams)
+        batch = snap["stages"].get("classify_batch", {})
+        lm = snap["stages"].get("landmarks", {})
+        self.status_lbl.setText(f"FPS {fps}  |  landmarks p50 {lm.get('p50_ms', 0):.1f} ms "
+                                f"x{self.worker.n_workers} workers  |  batch p50 {batch.get('p50_ms', 0):.2f} ms")
+        if time.monotonic() - self.last_export >= TELEMETRY_EXPORT_SEC:
+            self.last_export = time.monotonic()
+            self.worker.telemetry.export()
+
+    def closeEvent(self, event):
+        self.worker.stop()
+        event.accept()
@@ -0,0 +1,95 @@
+# src/overlay.py
+import cv2
+import numpy as np
+
+# Скелет кисти (как mp.solutions.hands.HAND_CONNECTIONS, без импорта mediapipe)
+HAND_CONNECTIONS = (
+    (0, 1), (1, 2), (2, 3), (3, 4),
+    (0, 5), (5, 6), (6, 7), (7, 8),
+    (5, 9), (9, 10), (10, 11), (11, 12),
+    (9, 13), (13, 14), (14, 15), (15, 16),
+    (13, 17), (0, 17), (17, 18), (18, 19), (19, 20),
+)
+# Те же 21 ребро как 6 ломаных: 5 пальцев + ладонь — один вызов polylines на слой
+HAND_PATHS = [np.array(p) for p in ([0, 1, 2, 3, 4], [0, 5, 6, 7, 8], [9, 10, 11, 12],
+                                    [13, 14, 15, 16], [0, 17, 18, 19, 20], [5, 9, 13, 17])]
+
+LEFT_COLORS = ((255, 0, 127), (255, 255, 255))   # линия, точки
+RIGHT_COLORS = ((0, 229, 255), (255, 255, 255))
+DOT_RADIUS = 3
+
+
+def to_pixels(points, w, h):
+    """(21, 3) нормализованные координаты -> (21, 2) int32 пиксели одним шагом"""
+    return (points[:, :2] * (w, h)).astype(np.int32)
+
+
+def draw_hand(image, pts, color_line, color_dot):
+    """Неоновая рука: черная подложка 3px, AA-линия 1px, точки поверх"""
+    paths = [pts[p] for p in HAND_PATHS]
+    cv2.polylines(image, paths, False, (0, 0, 0), 3)
+    cv2.polylines(image, paths, False, color_line, 1, cv2.LINE_AA)
+    # 21 cv2.circle быстрее NumPy-штампа по индексам (замерено)
+    for x, y in pts.tolist():
+        cv2.circle(image, (x, y), DOT_RADIUS, color_dot, -1)
+
+
+def draw_skeleton(image, hands):
+    """Неоновая отрисовка скелета (HandsResult) поверх BGR-кадра"""
+    h, w = image.shape[:2]
+    for points, (color_line, color_dot) in ((hands.left, LEFT_COLORS), (hands.right, RIGHT_COLORS)):
+        if points is not None:
+            draw_hand(image, to_pixels(points, w, h), color_line, color_dot)
+
+
+class SkeletonRenderer:
+    """
+    Оверлей скелета с пониженной частотой: every = N рисует заново раз в
+    N кадров, в остальных кадрах на холст копируется последний оверлей —
+    одна маскированная копия (cv2.copyTo) в рамке вокруг рук. AA-кайма линии лежит на
+    черной подложке, поэтому копия выглядит так же, как свежая отрисовка.
+    every = 1 — рисуем прямо на холсте каждый кадр.
+    """
+    # Фон слоя: цвет, которого нет в оверлее (черная подложка — (0, 0, 0))
+    BACKGROUND = (1, 1, 1)
+
+    def __init__(self, every=1):
+        self.every = max(1, int(every))
+        self._frame = 0
+        self._layer = None
+        self._box = None
+        self._mask = None
+
+    def draw(self, image, hands):
+        if self.every <= 1:
+            draw_skeleton(image, hands)
+            return
+        if self._frame % self.every == 0 or self._layer is None or self._layer.shape != image.shape:
+            self._render_layer(image.shape, hands)
+        self._frame += 1
+        if self._box is not None:
+            cv2.copyTo(self._layer[self._box], self._mask, image[self._box])
+
+    def _render_layer(self, shape, hands):
+        if self._layer is None or self._layer.shape != shape:
+            self._layer = np.empty(shape, dtype=np.uint8)
+            self._layer[:] = self.BACKGROUND
+        elif self._box is not None:
+            self._layer[self._box] = self.BACKGROUND  # стираем только прошлую рамку
+        self._box = None
+        h, w = shape[:2]
+        pts = [to_pixels(p, w, h) for p in (hands.left, hands.right) if p is not None]
+        if not pts:
+            return
+        draw_skeleton(self._layer, hands)
+
+        # Рамка вокруг рук с запасом на толщину линий и точки
+        allp = np.concatenate(pts)
+        pad = DOT_RADIUS + 2
+        x0, y0 = np.maximum(allp.min(axis=0) - pad, 0).tolist()
+        x1, y1 = np.minimum(allp.max(axis=0) + pad + 1, (w, h)).tolist()
+        if x0 >= x1 or y0 >= y1:
+            return
+        self._box = (slice(y0, y1), slice(x0, x1))
+        background = cv2.inRange(self._layer[self._box], self.BACKGROUND, self.BACKGROUND)
+        self._mask = cv2.bitwise_not(background)
@@ -0,0 +1,110 @@
+# src/pipeline.py
+import threading
+import time
+
+
+class LatestSlot:
+    """
+    Однослотовая очередь между стадиями конвейера.
+    put() всегда перезаписывает содержимое: если потребитель не успел забрать
+    старый кадр, он выбрасывается (считается в dropped). Так задержка между
+    стадиями никогда не превышает один кадр.
+    on_drop(item) — вернуть ресурсы выброшенного элемента (буфер кадра в пул).
+    """
+    def __init__(self, on_drop=None):
+        self._cond = threading.Condition()
+        self._item = None
+        self._has_item = False
+        self._closed = False
+        self.dropped = 0
+        self.on_drop = on_drop
+
+    def put(self, item):
+        old = None
+        with self._cond:
+            if self._has_item:
+                self.dropped += 1
+                old = self._item
+            self._item = item
+            self._has_item = True
+            self._cond.notify()
+        if old is not None and self.on_drop is not None:
+            self.on_drop(old)
+
+    def get(self, timeout=None):
+        """Ждет свежий элемент. Возвращает None по таймауту или после close()."""
+        with self._cond:
+            if not self._has_item and not self._closed:
+                self._cond.wait(timeout)
+            if not self._has_item:
+                return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+    def depth(self):
+        return 1 if self._has_item else 0
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class BufferPool:
+    """
+    Переиспользуемые буферы кадров: cap.read(pool.acquire()) пишет в
+    свободный буфер вместо нового массива. Последняя стадия (или
+    LatestSlot при выбросе) возвращает буфер через release().
+    Пул растет сам до реальной глубины конвейера и дальше не выделяет память.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._free = []
+        self.shape = None
+        self.allocated = 0
+
+    def acquire(self):
+        """Свободный буфер или None (тогда cv2 выделит новый)"""
+        with self._lock:
+            return self._free.pop() if self._free else None
+
+    def adopt(self, frame, buf):
+        """После cap.read(buf): учитывает новый массив, если cv2 не смог писать в buf"""
+        if frame is not buf:
+            self.allocated += 1
+            self.shape = frame.shape
+        return frame
+
+    def release(self, frame):
+        if frame is None or frame.shape != self.shape:
+            return  # кадр старого размера (камера сменила режим) — отдаем GC
+        with self._lock:
+            self._free.append(frame)
+
+
+class FramePacer:
+    """
+    Темп по дедлайнам вместо фиксированного sleep(1/FPS).
+    Спим только остаток до следующего дедлайна; если стадия опоздала больше
+    чем на кадр, расписание сдвигается, а не "догоняет" пачкой кадров.
+    """
+    def __init__(self, fps):
+        self.period = 1.0 / fps if fps and fps > 0 else 0.0
+        self._deadline = None
+
+    def wait(self):
+        if self.period <= 0:
+            return
+        now = time.perf_counter()
+        if self._deadline is None:
+            self._deadline = now + self.period
+            return
+        delay = self._deadline - now
+        if delay > -self.period:
+            if delay > 0:
+                time.sleep(delay)
+            self._deadline += self.period
+        else:
+            self._deadline = now + self.period
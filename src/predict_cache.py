@@ -0,0 +1,144 @@
+# src/predict_cache.py
+import threading
+from collections import OrderedDict
+import numpy as np
+from src.config import PREDICT_CACHE_SIZE, PREDICT_CACHE_STEP, PREDICT_CACHE_MIN_HIT
+
+
+class PredictionCache:
+    """
+    LRU-кэш предсказаний по кадру, два уровня:
+    - якорь: последний посчитанный кадр; кадр, отличающийся от него не
+      больше чем на step по каждой координате (доля размера руки), берет
+      его ответ. Якорь не сдвигается на попаданиях — дрейф ограничен step.
+      Это основной случай: жест держат, лес не запускается;
+    - LRU по признакам, округленным до step: возврат к недавней позе.
+      Одна ячейка в 126 измерениях дрожание почти всегда пересекает,
+      поэтому без якоря этот уровень попадает редко.
+    Рука в движении почти не попадает ни в один уровень, а проверки стоят
+    заметно на фоне леса. Поэтому ведется скользящая доля попаданий: ниже
+    min_hit кэш "холодный" — кадры идут сразу в модель, и только каждый
+    PROBE_EVERY-й сверяется с якорем и обновляет его. Попадание пробы
+    (жест снова держат) сразу возвращает обычный режим.
+    Кэш привязан к версии модели (NeuralEngine.model_version): другая
+    версия при get() очищает его — обучение, загрузка и новые прототипы
+    сбрасывают старые ответы.
+    maxsize <= 0 или step <= 0 — кэш выключен.
+    """
+    PROBE_EVERY = 8
+    SKIP = object()  # ключ "холодного" промаха: put() ничего не делает
+
+    def __init__(self, maxsize=PREDICT_CACHE_SIZE, step=PREDICT_CACHE_STEP, min_hit=PREDICT_CACHE_MIN_HIT,
+                 alpha=1.0 / 32):
+        self.maxsize = int(maxsize)
+        self.step = step
+        self.min_hit = min_hit
+        self.alpha = alpha
+        self._scale = np.float32(1.0 / step) if step > 0 else np.float32(0)
+        self._data = OrderedDict()
+        self._anchor_x = None     # признаки последнего посчитанного кадра
+        self._anchor_value = None
+        self._scratch = None      # |x - якорь| без выделения памяти
+        self._recent = 1.0        # скользящая доля попаданий
+        self._cold = 0            # кадров в холодном режиме (для проб)
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0         # промахи без LRU (рука в движении)
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.step > 0
+
+    def key(self, features):
+        return np.rint(features * self._scale).astype(np.int32).tobytes()
+
+    def get(self, features, version):
+        """-> (сохраненный результат или None, ключ для put: None — только якорь, SKIP — ничего)"""
+        with self._lock:
+            if version != self._version:
+                if self._data or self._anchor_value is not None:
+                    self.invalidations += 1
+                self._data.clear()
+                self._anchor_value = None
+                self._version = version
+            cold = self._recent < self.min_hit
+            if cold:
+                self._cold += 1
+                if self._cold % self.PROBE_EVERY:
+                    self.misses += 1
+                    self.bypassed += 1
+                    return None, self.SKIP
+            features = np.asarray(features, dtype=np.float32)
+            if self._anchor_value is not None and self._near_anchor(features):
+                if cold:
+                    self._recent = (1.0 + self.min_hit) / 2  # жест снова держат
+                    self._cold = 0
+                return self._hit(self._anchor_value), None
+            if cold:
+                self._miss()
+                return None, None
+            key = self.key(features)
+            value = self._data.get(key)
+            if value is None:
+                self._miss()
+                return None, key
+            self._data.move_to_end(key)
+            self._set_anchor(features, value)
+            return self._hit(value), key
+
+    def put(self, features, key, version, value):
+        """Результат промаха; key=None — только якорь"""
+        if key is self.SKIP:
+            return
+        with self._lock:
+            if version != self._version:
+                return  # модель сменилась, пока считали: результат устарел
+            self._set_anchor(np.asarray(features, dtype=np.float32), value)
+            if key is not None:
+                self._data[key] = value
+                if len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._anchor_value = None
+
+    # --- Служебное (под _lock) ---
+    def _near_anchor(self, features):
+        if features.shape != self._anchor_x.shape:
+            return False
+        np.subtract(features, self._anchor_x, out=self._scratch)
+        np.abs(self._scratch, out=self._scratch)
+        return self._scratch.max() <= self.step
+
+    def _set_anchor(self, features, value):
+        if self._anchor_x is None or self._anchor_x.shape != features.shape:
+            self._anchor_x = np.empty_like(features)
+            self._scratch = np.empty_like(features)
+        np.copyto(self._anchor_x, features)
+        self._anchor_value = value
+
+    def _hit(self, value):
+        self.hits += 1
+        self._recent += self.alpha * (1.0 - self._recent)
+        return value
+
+    def _miss(self):
+        self.misses += 1
+        self._recent -= self.alpha * self._recent
+
+    def __len__(self):
+        return len(self._data)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data),
+                "hit_rate": round(self.hit_rate(), 3), "recent_hit_rate": round(self._recent, 3),
+                "bypassed": self.bypassed, "invalidations": self.invalidations}
@@ -0,0 +1,36 @@
+# src/preprocess.py
+import cv2
+import numpy as np
+from src.config import ANALYSIS_SIZE
+
+
+def apply_boost(image, boost):
+    """
+    Программная яркость на месте (saturate(x * boost + 10), как раньше).
+    convertScaleAbs с dst= не выделяет память и на уменьшенном кадре
+    быстрее таблицы cv2.LUT (замерено src.benchmark, стадия preprocess).
+    """
+    if boost > 1.0:
+        cv2.convertScaleAbs(image, dst=image, alpha=boost, beta=10)
+    return image
+
+
+class FramePreprocessor:
+    """
+    Кадр камеры (BGR, полный размер) -> RGB для анализа в одном
+    переиспользуемом буфере: resize -> cvtColor -> зеркало и яркость на месте.
+    Полный кадр только читается один раз; все остальное — на уменьшенном.
+    Результат действителен до следующего вызова process().
+    """
+    def __init__(self, size=ANALYSIS_SIZE):
+        self.size = (int(size[0]), int(size[1]))
+        w, h = self.size
+        self._small = np.empty((h, w, 3), dtype=np.uint8)
+        self.rgb = np.empty((h, w, 3), dtype=np.uint8)
+
+    def process(self, frame, mirror=True, boost=1.0):
+        cv2.resize(frame, self.size, dst=self._small, interpolation=cv2.INTER_LINEAR)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        if mirror:
+            cv2.flip(self.rgb, 1, dst=self.rgb)
+        return apply_boost(self.rgb, boost)
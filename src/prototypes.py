@@ -0,0 +1,100 @@
+# src/prototypes.py
+import numpy as np
+from src.config import PROTO_PER_LABEL, PROTO_K
+
+
+def _subsample(X, n):
+    """Не больше n строк, равномерно по порядку записи"""
+    if len(X) <= n:
+        return np.asarray(X, dtype=np.float32)
+    return np.asarray(X[np.linspace(0, len(X) - 1, n).astype(np.intp)], dtype=np.float32)
+
+
+class PrototypeIndex:
+    """
+    Быстрый классификатор ближайших соседей по прототипам: до per_label
+    кадров на жест. Обновляется сразу после сохранения (extended) —
+    новый жест распознается до полного переобучения леса.
+    Неизменяемый: обновление возвращает новый индекс, поэтому поток
+    видео читает одну ссылку без блокировок (как fast_model).
+    """
+    ARRAYS = ("points", "label_idx")
+
+    def __init__(self, points, label_idx, labels, per_label=PROTO_PER_LABEL, k=PROTO_K):
+        self.points = points
+        self.label_idx = label_idx
+        self.labels = labels
+        self.per_label = int(per_label)
+        self.k = int(k)
+        self._sq_norms = np.einsum("ij,ij->i", points, points) if len(points) else np.zeros(0, np.float32)
+
+    @classmethod
+    def from_dataset(cls, X, y, per_label=PROTO_PER_LABEL, k=PROTO_K):
+        return cls.empty(per_label, k).extended(X, y)
+
+    @classmethod
+    def empty(cls, per_label=PROTO_PER_LABEL, k=PROTO_K):
+        return cls(np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int32), np.array([], dtype=str),
+                   per_label, k)
+
+    def label_set(self):
+        return set(str(l) for l in self.labels)
+
+    def extended(self, X, y):
+        """
+        Новый индекс с кадрами X: по каждому жесту старые и новые
+        прототипы прореживаются вместе до per_label.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        y = np.asarray(y).astype(str)
+        groups = {str(l): self.points[self.label_idx == i] for i, l in enumerate(self.labels)}
+        for label in np.unique(y):
+            new = X[y == label]
+            old = groups.get(label)
+            groups[label] = _subsample(new if old is None else np.vstack((old, new)), self.per_label)
+        return self._from_groups(groups)
+
+    def without(self, label):
+        groups = {str(l): self.points[self.label_idx == i] for i, l in enumerate(self.labels) if str(l) != label}
+        return self._from_groups(groups)
+
+    def _from_groups(self, groups):
+        labels = sorted(groups)
+        if not labels:
+            return self.empty(self.per_label, self.k)
+        points = np.vstack([groups[l] for l in labels])
+        label_idx = np.concatenate([np.full(len(groups[l]), i, dtype=np.int32) for i, l in enumerate(labels)])
+        return PrototypeIndex(points, label_idx, np.array(labels), self.per_label, self.k)
+
+    def __len__(self):
+        return len(self.points)
+
+    def predict_proba(self, X):
+        """(N, F) -> (N, n_labels): доля k ближайших прототипов за каждый жест"""
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.points.shape[1])
+        # |x - p|^2 без x^2 (одинаков для строки): одно умножение матриц
+        dist = self._sq_norms - 2.0 * (X @ self.points.T)
+        k = min(self.k, len(self.points))
+        nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        votes = np.zeros((len(X), len(self.labels)))
+        np.add.at(votes, (np.arange(len(X))[:, None], self.label_idx[nearest]), 1.0)
+        return votes / k
+
+    def predict_one(self, x):
+        """(F,) -> (label, conf)"""
+        probs = self.predict_proba(x)[0]
+        idx = int(np.argmax(probs))
+        return self.labels[idx], probs[idx]
+
+    def to_arrays(self):
+        """-> (arrays, meta) для model_artifact.save_artifact"""
+        meta = {"classes": [str(l) for l in self.labels], "per_label": self.per_label, "k": self.k}
+        return {"points": self.points, "label_idx": self.label_idx}, meta
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        missing = [name for name in cls.ARRAYS if name not in arrays]
+        if missing:
+            raise ValueError(f"Missing arrays: {missing}")
+        return cls(arrays["points"], arrays["label_idx"], np.array(meta["classes"]),
+                   meta.get("per_label", PROTO_PER_LABEL), meta.get("k", PROTO_K))
@@ -0,0 +1,119 @@
+# src/quality.py
+from src.config import (QUALITY_LEVELS, QUALITY_START_LEVEL, QUALITY_TARGET_FPS,
+                        QUALITY_TARGET_LATENCY_MS, QUALITY_ADAPTIVE)
+
+
+class QualityLevel:
+    """Одна ступень качества: размер кадра анализа, сложность модели, ключевой кадр раз в skip"""
+    def __init__(self, size, complexity, skip):
+        self.size = (int(size[0]), int(size[1]))
+        self.complexity = int(complexity)
+        self.skip = max(1, int(skip))
+
+    def __repr__(self):
+        return f"{self.size[0]}x{self.size[1]} m{self.complexity} 1/{self.skip}"
+
+
+class QualityController:
+    """
+    Держит бюджет кадра, переключая ступени QUALITY_LEVELS (0 — лучшая).
+    Вход — стоимость анализа кадра (уменьшение + landmarks) и задержка
+    end-to-end. Нагрузка = max(стоимость / (1000 / target_fps),
+    задержка / target_latency_ms).
+
+    Гистерезис, чтобы не качаться между ступенями:
+    - вниз (легче) — после down_frames кадров подряд с нагрузкой > 1;
+    - вверх (тяжелее) — после up_wait кадров подряд с нагрузкой < headroom;
+    - после переключения cooldown кадров без решений (новый граф
+      MediaPipe, новый размер буферов), среднее считается заново;
+    - если после шага вверх быстро пришлось вернуться, up_wait
+      удваивается (до max_up_wait), после долгой стабильности — сбрасывается.
+    """
+    def __init__(self, levels=QUALITY_LEVELS, start=QUALITY_START_LEVEL, target_fps=QUALITY_TARGET_FPS,
+                 target_latency_ms=QUALITY_TARGET_LATENCY_MS, enabled=QUALITY_ADAPTIVE,
+                 down_frames=15, up_frames=90, max_up_wait=1800, cooldown_frames=30,
+                 headroom=0.6, alpha=0.1):
+        self.levels = [l if isinstance(l, QualityLevel) else QualityLevel(**l) for l in levels]
+        self.level = min(max(0, int(start)), len(self.levels) - 1)
+        self.enabled = enabled
+        self.budget_ms = 1000.0 / target_fps
+        self.target_latency_ms = target_latency_ms
+        self.down_frames = down_frames
+        self.up_frames = up_frames
+        self.max_up_wait = max_up_wait
+        self.cooldown_frames = cooldown_frames
+        self.headroom = headroom
+        self.alpha = alpha
+
+        self.cost_ms = None
+        self.e2e_ms = None
+        self.changes = 0
+        self._frames = 0
+        self._over = 0
+        self._under = 0
+        self._cooldown = cooldown_frames
+        self._up_wait = up_frames
+        self._last_up = None
+
+    @property
+    def current(self):
+        return self.levels[self.level]
+
+    def load(self):
+        if self.cost_ms is None:
+            return 0.0
+        load = self.cost_ms / self.budget_ms
+        if self.target_latency_ms and self.e2e_ms is not None:
+            load = max(load, self.e2e_ms / self.target_latency_ms)
+        return load
+
+    def update(self, cost_ms, e2e_ms=None):
+        """Один кадр. True — ступень сменилась (применить current)"""
+        self._frames += 1
+        self.cost_ms = cost_ms if self.cost_ms is None else self.cost_ms + self.alpha * (cost_ms - self.cost_ms)
+        if e2e_ms is not None:
+            self.e2e_ms = e2e_ms if self.e2e_ms is None else self.e2e_ms + self.alpha * (e2e_ms - self.e2e_ms)
+        if not self.enabled:
+            return False
+        if self._cooldown > 0:
+            self._cooldown -= 1
+            return False
+
+        load = self.load()
+        if load > 1.0:
+            self._over += 1
+            self._under = 0
+        elif load < self.headroom:
+            self._under += 1
+            self._over = 0
+        else:
+            self._over = self._under = 0
+
+        if self._over >= self.down_frames and self.level < len(self.levels) - 1:
+            if self._last_up is not None and self._frames - self._last_up < 4 * self._up_wait:
+                self._up_wait = min(self._up_wait * 2, self.max_up_wait)  # шаг вверх не удержался
+            self._last_up = None
+            return self._switch(self.level + 1)
+        if self._under >= self._up_wait and self.level > 0:
+            if self._last_up is not None:
+                self._up_wait = self.up_frames  # прошлый шаг вверх удержался
+            self._last_up = self._frames
+            return self._switch(self.level - 1)
+        return False
+
+    def _switch(self, level):
+        self.level = level
+        self.changes += 1
+        self._over = self._under = 0
+        self._cooldown = self.cooldown_frames
+        self.cost_ms = None
+        self.e2e_ms = None
+        return True
+
+    def describe(self):
+        """Строка для интерфейса"""
+        lvl = self.current
+        cost = f"{self.cost_ms:.0f}" if self.cost_ms is not None else "-"
+        auto = "auto" if self.enabled else "fixed"
+        return (f"{lvl.size[0]}x{lvl.size[1]} | model {lvl.complexity} | keyframe 1/{lvl.skip} | "
+                f"{cost}/{self.budget_ms:.0f} ms | L{self.level} {auto}")
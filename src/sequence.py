@@ -0,0 +1,90 @@
+# src/sequence.py
+import numpy as np
+
+# Признаки окна: [текущий кадр, среднее, std, скорость, сдвиг за окно]
+WINDOW_PARTS = 5
+
+
+def window_size(n_features=126):
+    return WINDOW_PARTS * n_features
+
+
+class FeatureRing:
+    """
+    Кольцевой буфер последних K кадров признаков для динамических жестов.
+    Буфер выделяется один раз; push() обновляет скользящие суммы за O(F),
+    окно целиком никогда не копируется и не пересчитывается.
+    """
+    def __init__(self, window, n_features=126):
+        self.window = int(window)
+        self.n_features = n_features
+        self.buf = np.zeros((self.window, n_features), dtype=np.float32)
+        self._sum = np.zeros(n_features, dtype=np.float64)
+        self._sumsq = np.zeros(n_features, dtype=np.float64)
+        self.count = 0
+        self.pos = 0  # сюда пишется следующий кадр
+
+    def reset(self):
+        self._sum[:] = 0.0
+        self._sumsq[:] = 0.0
+        self.count = 0
+        self.pos = 0
+
+    @property
+    def full(self):
+        return self.count >= self.window
+
+    def push(self, x):
+        slot = self.buf[self.pos]
+        if self.full:
+            # Вытесняемый кадр уходит из скользящих сумм
+            self._sum -= slot
+            self._sumsq -= np.square(slot, dtype=np.float64)
+        else:
+            self.count += 1
+        slot[:] = x
+        self._sum += slot
+        self._sumsq += np.square(slot, dtype=np.float64)
+        self.pos = (self.pos + 1) % self.window
+
+    def window_features(self, out=None):
+        """Вектор признаков окна (5 * F,) float32; out — переиспользуемый буфер"""
+        n = self.count
+        F = self.n_features
+        if out is None:
+            out = np.empty(WINDOW_PARTS * F, dtype=np.float32)
+        last = self.buf[(self.pos - 1) % self.window]
+        prev = self.buf[(self.pos - 2) % self.window] if n > 1 else last
+        oldest = self.buf[self.pos % self.window] if self.full else self.buf[0]
+
+        mean = self._sum / n
+        var = np.maximum(self._sumsq / n - mean * mean, 0.0)
+
+        out[0:F] = last
+        out[F:2 * F] = mean
+        out[2 * F:3 * F] = np.sqrt(var)
+        np.subtract(last, prev, out=out[3 * F:4 * F])
+        np.subtract(last, oldest, out=out[4 * F:5 * F])
+        return out
+
+
+def window_features_batch(X, window):
+    """
+    Те же признаки окна, но для целой непрерывной записи (T, F) разом:
+    (T, F) -> (T - window + 1, 5 * F). Используется при обучении.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    T, F = X.shape
+    if T < window:
+        return np.zeros((0, WINDOW_PARTS * F), dtype=np.float32)
+
+    X64 = X.astype(np.float64)
+    csum = np.concatenate((np.zeros((1, F)), np.cumsum(X64, axis=0)))
+    csq = np.concatenate((np.zeros((1, F)), np.cumsum(X64 * X64, axis=0)))
+    mean = (csum[window:] - csum[:-window]) / window
+    var = np.maximum((csq[window:] - csq[:-window]) / window - mean * mean, 0.0)
+
+    last = X[window - 1:]
+    prev = X[window - 2:-1] if window > 1 else last
+    oldest = X[:T - window + 1]
+    return np.hstack((last, mean, np.sqrt(var), last - prev, last - oldest)).astype(np.float32)
@@ -0,0 +1,237 @@
+# src/server.py
+"""
+Headless-сервер распознавания: один NeuralEngine на много клиентов (киосков).
+
+Протокол: TCP, по одной JSON-строке на запрос/ответ.
+    -> {"id": 1, "client": "kiosk-3", "features": [126 чисел]}
+    -> {"id": 2, "client": "kiosk-3", "landmarks": [[[x, y, z] * 21] | null, ... | null]}
+    -> {"id": 3, "client": "kiosk-3", "frame": "<base64 JPEG/PNG>"}
+    <- {"id": 1, "label": "Сәлем", "conf": 0.91, "raw_label": "Сәлем", "raw_conf": 0.93}
+
+Запросы собираются в микропакеты (до --batch-max штук или --max-wait-ms
+ожидания) и классифицируются одним векторным вызовом predict_batch.
+Сглаживание — как pred_buffer в VideoWorker, отдельно для каждого клиента.
+
+    python -m src.server --port 8765 --batch-max 64 --max-wait-ms 2
+"""
+import json
+import base64
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.engine import NeuralEngine, normalize_points, HAND_FEATURES, NUM_LANDMARKS
+from src.voting import MajorityVote
+from src.config import SERVER_HOST, SERVER_PORT, SERVER_BATCH_MAX, SERVER_MAX_WAIT_MS, LANDMARK_BACKEND
+
+N_FEATURES = 2 * HAND_FEATURES
+
+
+class MicroBatcher:
+    """
+    Собирает одиночные запросы в пакеты для одного вызова predict_batch.
+    max_wait_ms — сколько первый запрос пакета готов ждать попутчиков:
+    0 = минимальная задержка, больше = крупнее пакеты и выше пропускная способность.
+    """
+    def __init__(self, engine, batch_max=SERVER_BATCH_MAX, max_wait_ms=SERVER_MAX_WAIT_MS):
+        self.engine = engine
+        self.batch_max = batch_max
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue()
+        self.votes = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="predict")
+        self.stats = {"requests": 0, "batches": 0}
+
+    async def submit(self, client, features):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((client, features, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.batch_max:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    # Забираем то, что уже лежит в очереди, без ожидания
+                    if self.queue.empty():
+                        break
+                    batch.append(self.queue.get_nowait())
+                    continue
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                # Внутри try: ошибка пакета завершает только его запросы, цикл продолжает работу
+                X = np.stack([item[1] for item in batch])
+                labels, confs = await loop.run_in_executor(self.executor, self.engine.predict_batch, X)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            for (client, feats, future), label, conf in zip(batch, labels, confs):
+                votes = self.votes.setdefault(client, MajorityVote(maxlen=10, threshold=0.65))
+                if feats.any():
+                    smoothed = votes.push(label, conf)
+                else:
+                    votes.push_empty()
+                    smoothed, label, conf = votes.leader(), "...", 0.0
+                if not future.done():
+                    future.set_result((str(smoothed), str(label), float(conf)))
+
+    def forget(self, client):
+        self.votes.pop(client, None)
+
+
+class FrameDecoder:
+    """Сырые кадры -> признаки: по одному landmark-бэкенду на поток пула"""
+    def __init__(self, workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="landmarks")
+        self._local = threading.local()
+
+    def _features(self, payload):
+        import cv2
+        from src.landmarks import create_backend
+        from src.preprocess import FramePreprocessor
+        if not hasattr(self._local, "backend"):
+            self._local.backend = create_backend(LANDMARK_BACKEND)
+            self._local.preprocessor = FramePreprocessor()
+        buf = np.frombuffer(base64.b64decode(payload), dtype=np.uint8)
+        frame = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("Cannot decode frame")
+        # Клиент присылает кадр уже в нужной ориентации
+        rgb = self._local.preprocessor.process(frame, mirror=False)
+        hands = self._local.backend.process(rgb)
+        return np.concatenate((normalize_points(hands.left), normalize_points(hands.right)))
+
+    async def decode(self, payload):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._features, payload)
+
+
+def parse_features(msg):
+    """features / landmarks из запроса -> (126,) float32"""
+    if "features" in msg:
+        feats = np.asarray(msg["features"], dtype=np.float32)
+        if feats.shape != (N_FEATURES,):
+            raise ValueError(f"features must have {N_FEATURES} values")
+        return feats
+    hands = msg["landmarks"]
+    if len(hands) != 2:
+        raise ValueError("landmarks must be [left, right]")
+    points = []
+    for h in hands:
+        h = None if h is None else np.asarray(h, dtype=np.float64)
+        if h is not None and h.size and h.shape != (NUM_LANDMARKS, 3):
+            raise ValueError(f"each hand must be null or {NUM_LANDMARKS} points [x, y, z]")
+        points.append(h)
+    return np.concatenate([normalize_points(h) for h in points])
+
+
+class RecognitionServer:
+    def __init__(self, engine, batch_max=SERVER_BATCH_MAX, max_wait_ms=SERVER_MAX_WAIT_MS, frame_workers=2):
+        self.engine = engine
+        self.batch_max = batch_max
+        self.max_wait_ms = max_wait_ms
+        self.frame_workers = frame_workers
+        self.batcher = None
+        self.decoder = None
+
+    async def handle(self, reader, writer):
+        clients = set()
+        pending = set()
+        lock = asyncio.Lock()
+
+        async def answer(msg):
+            req_id = None
+            try:
+                if not isinstance(msg, dict):
+                    raise ValueError("request must be a JSON object")
+                req_id = msg.get("id")
+                client = str(msg.get("client", id(writer)))
+                clients.add(client)
+                if "frame" in msg:
+                    feats = await self.decoder.decode(msg["frame"])
+                else:
+                    feats = parse_features(msg)
+                label, raw_label, raw_conf = await self.batcher.submit(client, feats)
+                reply = {"id": req_id, "label": label, "conf": raw_conf,
+                         "raw_label": raw_label, "raw_conf": raw_conf}
+            except Exception as e:
+                reply = {"id": req_id, "error": str(e)}
+            async with lock:
+                writer.write((json.dumps(reply, ensure_ascii=False) + "\n").encode("utf-8"))
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue
+                # Запросы одного соединения обрабатываются конвейерно
+                task = asyncio.create_task(answer(msg))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        finally:
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            for client in clients:
+                self.batcher.forget(client)
+            writer.close()
+
+    async def report(self, every=10.0):
+        last = dict(self.batcher.stats)
+        while True:
+            await asyncio.sleep(every)
+            s = self.batcher.stats
+            reqs = s["requests"] - last["requests"]
+            batches = s["batches"] - last["batches"]
+            if reqs:
+                print(f"[SERVER] {reqs / every:.0f} req/s, avg batch {reqs / max(batches, 1):.1f}, "
+                      f"clients {len(self.batcher.votes)}")
+            last = dict(s)
+
+    async def serve(self, host=SERVER_HOST, port=SERVER_PORT):
+        self.batcher = MicroBatcher(self.engine, self.batch_max, self.max_wait_ms)
+        self.decoder = FrameDecoder(self.frame_workers)
+        server = await asyncio.start_server(self.handle, host, port, limit=2 ** 22)
+        print(f"[SERVER] Listening on {host}:{port} (batch<={self.batch_max}, wait<={self.max_wait_ms} ms)")
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.batcher.run(), self.report())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless sign recognition server")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--batch-max", type=int, default=SERVER_BATCH_MAX, help="Max requests per batch")
+    parser.add_argument("--max-wait-ms", type=float, default=SERVER_MAX_WAIT_MS,
+                        help="How long a batch waits for more requests (latency/throughput tradeoff)")
+    parser.add_argument("--frame-workers", type=int, default=2, help="Threads for raw-frame landmark inference")
+    args = parser.parse_args(argv)
+
+    engine = NeuralEngine()
+    if not engine.is_trained:
+        print("[SERVER] Warning: no trained model, all answers will be '...'")
+    server = RecognitionServer(engine, args.batch_max, args.max_wait_ms, args.frame_workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
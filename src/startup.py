@@ -0,0 +1,46 @@
+# src/startup.py
+import time
+import threading
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    """
+    Разбивка холодного старта:
+    - mark(name) — момент этапа от старта (первый вызов побеждает);
+    - measure(name) — длительность шага (шаги в фоне идут параллельно).
+    Модуль легкий: main.py импортирует его первым, до Qt/cv2.
+    """
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.marks = {}
+        self.durations = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        ms = (time.perf_counter() - self.t0) * 1000
+        with self._lock:
+            self.marks.setdefault(name, ms)
+
+    @contextmanager
+    def measure(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.durations[name] = (time.perf_counter() - t) * 1000
+
+    def snapshot(self):
+        with self._lock:
+            return {"marks_ms": {k: round(v, 1) for k, v in self.marks.items()},
+                    "steps_ms": {k: round(v, 1) for k, v in self.durations.items()}}
+
+    def report(self):
+        snap = self.snapshot()
+        lines = [f"  {name:<16}@ {ms:>8.1f} ms" for name, ms in sorted(snap["marks_ms"].items(), key=lambda kv: kv[1])]
+        lines += [f"  {name:<16}  {ms:>8.1f} ms" for name, ms in snap["steps_ms"].items()]
+        return "\n".join(lines)
+
+
+startup = StartupProfile()
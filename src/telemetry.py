@@ -0,0 +1,203 @@
+# src/telemetry.py
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+
+
+def _bucket_bounds(lo_ns=1_000, hi_ns=10_000_000_000, per_decade=20):
+    """Логарифмические границы корзин от 1 мкс до 10 с"""
+    bounds = []
+    b = float(lo_ns)
+    step = 10 ** (1.0 / per_decade)
+    while b < hi_ns:
+        bounds.append(int(b))
+        b *= step
+    bounds.append(hi_ns)
+    return bounds
+
+
+BUCKETS = _bucket_bounds()
+
+
+class LatencyHistogram:
+    """
+    Гистограмма фиксированного размера: запись = bisect + инкремент,
+    без аллокаций. Перцентили — по верхней границе корзины (±12%).
+    Своя блокировка: одну стадию пишут несколько потоков (камеры multi_stream).
+    """
+    __slots__ = ("counts", "count", "total_ns", "max_ns", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self._lock = threading.Lock()
+
+    def record(self, ns):
+        i = bisect.bisect_left(BUCKETS, ns)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total_ns += ns
+            if ns > self.max_ns:
+                self.max_ns = ns
+
+    def percentile(self, q):
+        if self.count == 0:
+            return 0
+        target = q / 100.0 * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max_ns
+        return self.max_ns
+
+    def summary(self):
+        with self._lock:
+            return self._summary()
+
+    def _summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ns / self.count / 1e6 if self.count else 0.0,
+            "p50_ms": self.percentile(50) / 1e6,
+            "p95_ms": self.percentile(95) / 1e6,
+            "p99_ms": self.percentile(99) / 1e6,
+            "max_ms": self.max_ns / 1e6,
+        }
+
+
+class FpsMeter:
+    """Измеренный FPS по скользящему среднему интервалов между кадрами"""
+    def __init__(self, alpha=0.05):
+        self.alpha = alpha
+        self.last_ns = None
+        self.avg_interval_ns = 0.0
+
+    def tick(self, now_ns=None):
+        now_ns = now_ns or time.perf_counter_ns()
+        if self.last_ns is not None:
+            dt = now_ns - self.last_ns
+            if self.avg_interval_ns == 0.0:
+                self.avg_interval_ns = dt
+            else:
+                self.avg_interval_ns += self.alpha * (dt - self.avg_interval_ns)
+        self.last_ns = now_ns
+
+    @property
+    def fps(self):
+        return 1e9 / self.avg_interval_ns if self.avg_interval_ns else 0.0
+
+
+class Telemetry:
+    """
+    Постоянно включенная телеметрия горячего пути:
+    - record(stage, ns) — гистограмма задержек по стадиям;
+    - count(name) / gauge(name, value) — счетчики и текущие значения;
+    - fps(name).tick() — измеренный FPS против целевого;
+    - trace(record) — подробная запись по каждому кадру (только если
+      включен trace_enabled), пишется в отдельный ротируемый файл;
+    - export() — снимок в ротируемый файл telemetry.jsonl.
+    """
+    def __init__(self, target_fps, log_dir="logs", max_bytes=1_000_000, backups=5):
+        self.target_fps = target_fps
+        self.log_dir = log_dir
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.meters = {}
+        self.trace_enabled = False
+        self._lock = threading.Lock()
+        self._export_log = None
+        self._trace_log = None
+
+    def record(self, stage, ns):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(stage, LatencyHistogram())
+        hist.record(ns)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value  # последнее значение: запись без чтения, блокировка не нужна
+
+    def fps(self, name):
+        meter = self.meters.get(name)
+        if meter is None:
+            with self._lock:
+                meter = self.meters.setdefault(name, FpsMeter())
+        return meter
+
+    def trace(self, record):
+        if not self.trace_enabled:
+            return
+        if self._trace_log is None:
+            self._trace_log = self._rotating_logger("trace", "trace.jsonl")
+        self._trace_log.info(json.dumps(record))
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def snapshot(self):
+        # Копии словарей под той же блокировкой, под которой count() и
+        # создание метрик их меняют (гистограммы — под своими блокировками)
+        with self._lock:
+            stages = {name: h.summary() for name, h in self.histograms.items()}
+            meters = dict(self.meters)
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "target_fps": self.target_fps,
+            "fps": {name: round(m.fps, 1) for name, m in meters.items()},
+            "stages": stages,
+            "counters": counters,
+            "gauges": gauges,
+        }
+
+    def export(self):
+        """Дописывает снимок в ротируемый logs/telemetry.jsonl"""
+        if self._export_log is None:
+            self._export_log = self._rotating_logger("export", "telemetry.jsonl")
+        self._export_log.info(json.dumps(self.snapshot(), ensure_ascii=False))
+        return os.path.join(self.log_dir, "telemetry.jsonl")
+
+    def _rotating_logger(self, name, filename):
+        os.makedirs(self.log_dir, exist_ok=True)
+        logger = logging.getLogger(f"sign.telemetry.{name}.{id(self)}")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        handler = RotatingFileHandler(os.path.join(self.log_dir, filename),
+                                      maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        return logger
+
+
+def format_snapshot(snap):
+    """Текстовая таблица для вкладки настроек"""
+    lines = []
+    fps = ", ".join(f"{k}: {v:.1f}" for k, v in snap["fps"].items())
+    lines.append(f"FPS (target {snap['target_fps']}): {fps or '-'}")
+    lines.append(f"{'stage':<14}{'p50':>8}{'p95':>8}{'p99':>8}{'n':>9}  (ms)")
+    for name, s in snap["stages"].items():
+        lines.append(f"{name:<14}{s['p50_ms']:>8.2f}{s['p95_ms']:>8.2f}{s['p99_ms']:>8.2f}{s['count']:>9}")
+    if snap["counters"]:
+        lines.append("  ".join(f"{k}={v}" for k, v in snap["counters"].items()))
+    if snap["gauges"]:
+        lines.append("  ".join(f"{k}={v}" for k, v in snap["gauges"].items()))
+    return "\n".join(lines)
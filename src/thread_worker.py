@@ -1,117 +1,321 @@
 import cv2
-import mediapipe as mp
 import numpy as np
 import time
-from collections import deque, Counter
+import threading
 from PyQt6.QtCore import QThread, pyqtSignal
-from src.engine import NeuralEngine
-from src.config import CAMERA_ID, FRAME_WIDTH, FRAME_HEIGHT, FPS_LIMIT
+from src.engine import NeuralEngine, normalize_points, HAND_FEATURES
+from src.landmarks import create_backend, KeyframeTracker, HandsResult
+from src.pipeline import LatestSlot, FramePacer, BufferPool
+from src.preprocess import FramePreprocessor
+from src.sequence import FeatureRing, window_size
+from src.voting import MajorityVote
+from src.collect import CollectBuffer
+from src.telemetry import Telemetry
+from src.display import DisplayFrames
+from src.overlay import SkeletonRenderer
+from src.quality import QualityController
+from src.startup import startup
+from src.config import (CAMERA_ID, FRAME_WIDTH, FRAME_HEIGHT, FPS_LIMIT,
+                        LANDMARK_BACKEND, KEYFRAME_INTERVAL_MAX, TRACK_MIN_CONFIDENCE,
+                        SEQUENCE_MODE, SEQ_WINDOW, TELEMETRY_DIR, DISPLAY_SIZE,
+                        OVERLAY_EVERY, COLLECT_SPOOL_DIR)
 
 class VideoWorker(QThread):
-    frame_signal = pyqtSignal(np.ndarray)
-    data_signal = pyqtSignal(str, float, str)
-    
+    # Модель и landmarks прогреты: можно распознавать и обучать
+    ready_signal = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.running = True
         self.mirror = True
         self.light_boost = 1.0
-        self.engine = NeuralEngine()
+        # Тяжелая инициализация (NeuralEngine, граф MediaPipe) — в фоне, см. _warm_up()
+        self.engine = None
+        self.landmarker = None
+        self.ready = threading.Event()
+        self.telemetry = Telemetry(target_fps=FPS_LIMIT, log_dir=TELEMETRY_DIR)
+
+        # Кадры для GUI готовятся здесь, GUI забирает самый свежий по таймеру
+        self.display = DisplayFrames(*DISPLAY_SIZE)
+        self.overlay = SkeletonRenderer(OVERLAY_EVERY)
+        # Полные кадры камеры переиспользуются: пул буферов + анализ в одном буфере
+        self.frame_pool = BufferPool()
+        # Адаптивное качество: размер анализа, сложность модели, пропуск кадров
+        self.quality = QualityController()
+        self.preprocessor = FramePreprocessor(self.quality.current.size)
+        self.complexity = self.quality.current.complexity
+        self.pending_backend = None   # (сложность, backend), собранный в фоне
+        self.backend_loading = False
+        self.last_e2e_ms = None
+        self.latest_data = ("...", 0.0, "WARMUP")
         
         # Буфер для стабилизации ( Majority Voting )
-        self.pred_buffer = deque(maxlen=10)
-        
-        self.mp_holistic = mp.solutions.holistic
-        self.holistic = self.mp_holistic.Holistic(
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
-            model_complexity=0  # Быстрый режим для 60 FPS
-        )
+        self.votes = MajorityVote(maxlen=10, threshold=0.65)
+
+        # Режим последовательностей: окно последних SEQ_WINDOW кадров
+        self.sequence_mode = SEQUENCE_MODE
+        self.seq_ring = FeatureRing(SEQ_WINDOW)
+        self.seq_features = np.empty(window_size(), dtype=np.float32)
         
         self.mode = "PREDICT"
         self.collect_label = ""
-        self.buffer_X = []
-        self.buffer_y = []
+        # float32-буфер записи, длинные записи сбрасываются на диск блоками
+        # Пишутся все кадры: окна динамических жестов строятся по непрерывным сессиям,
+        # почти одинаковые кадры отсеиваются только при обучении модели по кадру
+        self.collect = CollectBuffer(COLLECT_SPOOL_DIR, width=2 * HAND_FEATURES)
 
     def run(self):
-        cap = cv2.VideoCapture(CAMERA_ID)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
-        
+        """
+        Конвейер из трех стадий:
+        захват (поток) -> landmarks (поток) -> логика/отрисовка/сигналы (QThread).
+        Стадии связаны однослотовыми очередями: каждая берет только самый свежий
+        кадр, поэтому задержка ~ одно время инференса, а не сумма всех стадий.
+        Полный кадр камеры только читается (две уменьшенные копии: анализ и
+        экран) и возвращается в пул; выброшенные очередями кадры — тоже.
+        """
+        release = lambda item: self.frame_pool.release(item[0])
+        self.capture_slot = LatestSlot(on_drop=release)
+        self.result_slot = LatestSlot(on_drop=release)
+        warm_up = threading.Thread(target=self._warm_up, name="warm-up", daemon=True)
+        warm_up.start()
+
+        with startup.measure("camera_open"):
+            cap = cv2.VideoCapture(CAMERA_ID)
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+
+        stages = [
+            threading.Thread(target=self._capture_loop, args=(cap,), name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="landmarks", daemon=True),
+        ]
+        for t in stages:
+            t.start()
+
+        try:
+            self._render_loop()
+        finally:
+            self.capture_slot.close()
+            self.result_slot.close()
+            for t in stages:
+                t.join(timeout=2.0)
+            cap.release()
+
+    def _warm_up(self):
+        """
+        Параллельно: NeuralEngine (хранилище + модель) и граф MediaPipe.
+        Пока идет прогрев, камера уже показывается, распознавания нет.
+        """
+        def load_engine():
+            with startup.measure("engine_load"):
+                self.engine = NeuralEngine()
+            recovered = self.collect.recover(self.engine)
+            if recovered:
+                print(f"[WORKER] Recovered {recovered} unsaved frames after a crash.")
+
+        def load_landmarks():
+            with startup.measure("landmarks_init"):
+                # Holistic или только руки + трекинг между ключевыми кадрами
+                self.landmarker = KeyframeTracker(
+                    create_backend(LANDMARK_BACKEND, model_complexity=self.complexity),
+                    max_interval=max(KEYFRAME_INTERVAL_MAX, self.quality.current.skip),
+                    min_confidence=TRACK_MIN_CONFIDENCE
+                )
+
+        loaders = [threading.Thread(target=load_engine, daemon=True),
+                   threading.Thread(target=load_landmarks, daemon=True)]
+        for t in loaders:
+            t.start()
+        for t in loaders:
+            t.join()
+        if self.engine is None or self.landmarker is None:
+            print("[WORKER] Warm-up failed.")
+            return
+        startup.mark("ready")
+        self.ready.set()
+        self.ready_signal.emit()
+
+    def _capture_loop(self, cap):
+        """Стадия 1: чтение камеры в буфер из пула (зеркало и яркость — после уменьшения)"""
+        pacer = FramePacer(FPS_LIMIT)
+        tel = self.telemetry
+        pool = self.frame_pool
         while self.running:
-            ret, frame = cap.read()
-            if not ret: continue
+            t0 = time.perf_counter_ns()
+            buf = pool.acquire()
+            ret, frame = cap.read(buf)
+            if not ret:
+                pool.release(buf)
+                tel.count("capture_fail")
+                time.sleep(0.005)
+                continue
+            frame = pool.adopt(frame, buf)
+            t1 = time.perf_counter_ns()
+            tel.record("capture", t1 - t0)
+            tel.fps("capture").tick(t1)
 
-            if self.mirror:
-                frame = cv2.flip(frame, 1)
+            # Настройки снимаются вместе с кадром: анализ и экран видят одинаковые
+            self.capture_slot.put((frame, t1, self.mirror, self.light_boost))
+            # Frame pacing: не чаще FPS_LIMIT, без лишнего sleep поверх работы
+            pacer.wait()
 
-            # --- 1. LIGHT BOOST (Программная яркость) ---
-            if self.light_boost > 1.0:
-                frame = cv2.convertScaleAbs(frame, alpha=self.light_boost, beta=10)
+    def _inference_loop(self):
+        """Стадия 2: landmarks (MediaPipe / трекинг) + нормализация"""
+        tel = self.telemetry
+        no_hands = HandsResult()
+        no_features = np.zeros(2 * HAND_FEATURES, dtype=np.float32)
+        while self.running:
+            item = self.capture_slot.get(timeout=0.1)
+            if item is None:
+                continue
+            frame, t_capture, mirror, boost = item
+            if self.landmarker is None:
+                # Прогрев: кадр сразу идет на экран, без landmarks
+                self.result_slot.put((frame, no_hands, no_features, t_capture, 0, mirror, boost))
+                continue
+
+            # --- 2. ОБРАБОТКА (уменьшение, затем зеркало и яркость — в одном буфере) ---
+            t0 = time.perf_counter_ns()
+            rgb_small = self.preprocessor.process(frame, mirror, boost)
+            t1 = time.perf_counter_ns()
+            hands = self.landmarker.process(rgb_small, mirrored=mirror)
+            t2 = time.perf_counter_ns()
+            tel.record("preprocess", t1 - t0)
+            tel.record("landmarks", t2 - t1)
 
-            # --- 2. ОБРАБОТКА (Анализ на уменьшенном кадре для скорости) ---
-            small_frame = cv2.resize(frame, (640, 360))
-            rgb_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            results = self.holistic.process(rgb_small)
-            
             # --- 3. ЭКСТРАКЦИЯ С НОРМАЛИЗАЦИЕЙ ---
-            # Используем метод нормализации из engine
-            l_hand = self.engine.normalize_hand(results.left_hand_landmarks)
-            r_hand = self.engine.normalize_hand(results.right_hand_landmarks)
-            features = l_hand + r_hand
+            l_hand = normalize_points(hands.left)
+            r_hand = normalize_points(hands.right)
+            features = np.concatenate((l_hand, r_hand))
+
+            tel.record("normalize", time.perf_counter_ns() - t2)
+            self.result_slot.put((frame, hands, features, t_capture, t2 - t1, mirror, boost))
+
+            # --- КАЧЕСТВО --- (в этом же потоке: буферы и модель меняются между кадрами)
+            if self.quality.update((t2 - t0) / 1e6, self.last_e2e_ms):
+                self._apply_quality()
+            self._swap_backend()
+            tel.gauge("quality_level", self.quality.level)
+            tel.gauge("analysis_width", self.preprocessor.size[0])
+            tel.gauge("model_complexity", self.complexity)
+            tel.gauge("keyframe_skip", self.landmarker.max_interval)
+
+    def _apply_quality(self):
+        """Новая ступень качества: размер и пропуск сразу, модель — в фоне"""
+        level = self.quality.current
+        print(f"[QUALITY] -> level {self.quality.level}: {level}")
+        if self.preprocessor.size != level.size:
+            self.preprocessor = FramePreprocessor(level.size)
+            self.landmarker.reset()  # оптический поток по кадрам разного размера невозможен
+        self.landmarker.set_max_interval(max(KEYFRAME_INTERVAL_MAX, level.skip))
+        self._load_backend()
+
+    def _load_backend(self):
+        """Граф MediaPipe другой сложности собирается в фоне (~1 с), старый работает до подмены"""
+        complexity = self.quality.current.complexity
+        if complexity == self.complexity or self.backend_loading:
+            return
+        self.backend_loading = True
+
+        def build():
+            try:
+                self.pending_backend = (complexity, create_backend(LANDMARK_BACKEND, model_complexity=complexity))
+            except Exception as e:
+                print(f"[QUALITY] Model complexity {complexity} failed: {e}")
+                self.backend_loading = False
+
+        threading.Thread(target=build, name="quality-backend", daemon=True).start()
+
+    def _swap_backend(self):
+        pending = self.pending_backend
+        if pending is None:
+            return
+        self.pending_backend = None
+        self.complexity, backend = pending
+        self.landmarker.set_backend(backend).close()
+        self.backend_loading = False
+        # Пока граф собирался, ступень могла снова смениться
+        self._load_backend()
+
+    def _render_loop(self):
+        """Стадия 3: логика режимов, отрисовка и подготовка кадра для GUI"""
+        tel = self.telemetry
+        while self.running:
+            item = self.result_slot.get(timeout=0.1)
+            if item is None:
+                continue
+            frame, hands, features, t_capture, landmarks_ns, mirror, boost = item
+            t0 = time.perf_counter_ns()
 
             status_text = "..."
             conf = 0.0
+            recording = False
+            mode = self.mode if self.ready.is_set() else "WARMUP"
             
-            # --- 4. ЛОГИКА ---
-            if any(v != 0 for v in features):
-                if self.mode == "COLLECT" and self.collect_label:
-                    self.buffer_X.append(features)
-                    self.buffer_y.append(self.collect_label)
-                    cv2.circle(frame, (40, 40), 15, (0, 0, 255), -1)
-                    status_text = f"REC: {len(self.buffer_X)}"
+            # --- 4. ЛОГИКА --- (во время прогрева признаков нет: только показ кадра)
+            if features.any():
+                if mode == "COLLECT" and self.collect_label:
+                    count = self.collect.append(features, self.collect_label)
+                    recording = True
+                    status_text = f"REC: {count}"
                 
-                elif self.mode == "PREDICT":
-                    res_label, res_conf = self.engine.predict(features)
+                elif mode == "PREDICT":
+                    res_label, res_conf = self.classify(features)
                     
                     # Стабилизация через буфер
-                    if res_conf > 0.65:
-                        self.pred_buffer.append(res_label)
-                    else:
-                        self.pred_buffer.append("...")
-                    
-                    if len(self.pred_buffer) > 0:
-                        counts = Counter(self.pred_buffer)
-                        status_text, count = counts.most_common(1)[0]
-                        conf = res_conf
+                    status_text = self.votes.push(res_label, res_conf)
+                    conf = res_conf
             else:
-                self.pred_buffer.append("...")
+                self.votes.push_empty()
+                self.seq_ring.reset()  # рука пропала — окно начинается заново
+            t1 = time.perf_counter_ns()
 
-            # --- 5. ОТРИСОВКА ---
-            self.draw_beautiful_skeleton(frame, results)
+            # --- 5. ОТРИСОВКА --- (на холсте размера панели; полный кадр возвращается в пул)
+            canvas = self.display.begin(frame, mirror, boost)
+            self.frame_pool.release(frame)
+            t_canvas = time.perf_counter_ns()
+            if recording:
+                cv2.circle(canvas, (40, 40), 15, (0, 0, 255), -1)
+            self.draw_beautiful_skeleton(canvas, hands)
+            t2 = time.perf_counter_ns()
 
-            self.frame_signal.emit(frame)
-            self.data_signal.emit(status_text, conf, self.mode)
-            
-            # Frame pacing (60 FPS)
-            time.sleep(1/FPS_LIMIT)
-            
-        cap.release()
+            # Кадр уже под размер панели и в RGB; текст — последним значением
+            self.display.commit()
+            self.latest_data = (str(status_text), float(conf), mode)
+            t3 = time.perf_counter_ns()
+            startup.mark("first_frame")
 
-    def draw_beautiful_skeleton(self, image, results):
+            tel.record("classify", t1 - t0)
+            tel.record("draw", t2 - t_canvas)
+            tel.record("publish", (t_canvas - t1) + (t3 - t2))
+            tel.record("end_to_end", t3 - t_capture)
+            self.last_e2e_ms = (t3 - t_capture) / 1e6
+            tel.fps("render").tick(t3)
+            tel.gauge("dropped_capture", self.capture_slot.dropped)
+            tel.gauge("dropped_result", self.result_slot.dropped)
+            tel.gauge("queue_capture", self.capture_slot.depth())
+            tel.gauge("queue_result", self.result_slot.depth())
+            tel.gauge("gui_coalesced", self.display.coalesced)
+            tel.gauge("frame_buffers", self.frame_pool.allocated)
+            if self.engine is not None:
+                tel.gauge("predict_cache_hit_rate", round(self.engine.predict_cache.hit_rate(), 3))
+            if tel.trace_enabled:
+                tel.trace({"t": t_capture, "landmarks_us": landmarks_ns // 1000,
+                           "classify_us": (t1 - t0) // 1000, "draw_us": (t2 - t_canvas) // 1000,
+                           "publish_us": ((t_canvas - t1) + (t3 - t2)) // 1000, "e2e_us": (t3 - t_capture) // 1000,
+                           "keyframe": hands.keyframe, "label": status_text, "conf": round(float(conf), 3)})
+
+    def classify(self, features):
+        """Кадр -> (Label, Conf): модель окон, если включена и обучена, иначе по кадру"""
+        if self.sequence_mode and self.engine.seq_fast is not None:
+            self.seq_ring.push(features)
+            if not self.seq_ring.full:
+                return "...", 0.0
+            return self.engine.predict_sequence(self.seq_ring.window_features(out=self.seq_features))
+        return self.engine.predict(features)
+
+    def draw_beautiful_skeleton(self, image, hands):
         """Неоновая отрисовка скелета"""
-        h, w, _ = image.shape
-        def draw_side(landmarks, color_line, color_dot):
-            if not landmarks: return
-            pts = [(int(lm.x * w), int(lm.y * h)) for lm in landmarks.landmark]
-            for s, e in self.mp_holistic.HAND_CONNECTIONS:
-                cv2.line(image, pts[s], pts[e], (0, 0, 0), 3)
-                cv2.line(image, pts[s], pts[e], color_line, 1, cv2.LINE_AA)
-            for p in pts:
-                cv2.circle(image, p, 3, color_dot, -1)
-
-        draw_side(results.left_hand_landmarks, (255, 0, 127), (255, 255, 255))
-        draw_side(results.right_hand_landmarks, (0, 229, 255), (255, 255, 255))
+        self.overlay.draw(image, hands)
 
     def start_collect(self, label):
         self.mode = "COLLECT"
@@ -122,13 +326,48 @@ class VideoWorker(QThread):
         self.collect_label = ""
 
     def save_data(self):
-        count = self.engine.save_dataset(self.buffer_X, self.buffer_y)
-        self.buffer_X, self.buffer_y = [], []
-        return count
+        if self.engine is None:
+            return 0
+        return self.collect.save_to(self.engine)
 
     def train_model(self):
         return self.engine.train()
 
     def stop(self):
         self.running = False
-        self.wait()
\ No newline at end of file
+        self.wait()
+        if self.pending_backend is not None:
+            self.pending_backend[1].close()
+        # Штатный выход: несохраненная запись отбрасывается, как и раньше
+        self.collect.discard()
+
+
+class TrainWorker(QThread):
+    """
+    Фоновое обучение: GUI не замирает, видео продолжает распознавать старой
+    моделью, новая подменяется в NeuralEngine атомарно (swap_model).
+    """
+    progress_signal = pyqtSignal(int, int)
+    done_signal = pyqtSignal(bool, str)
+
+    def __init__(self, engine, only_if_dirty=False, with_sequence=False):
+        super().__init__()
+        self.engine = engine
+        self.only_if_dirty = only_if_dirty
+        self.with_sequence = with_sequence
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        if self.only_if_dirty and not self.engine.dirty:
+            self.done_signal.emit(False, "Model is up to date.")
+            return
+        ok, msg = self.engine.train(progress=self.progress_signal.emit,
+                                    cancel_event=self.cancel_event)
+        if ok and self.with_sequence:
+            _, seq_msg = self.engine.train_sequence(progress=self.progress_signal.emit,
+                                                    cancel_event=self.cancel_event)
+            msg = f"{msg} {seq_msg}"
+        self.done_signal.emit(ok, msg)
+
+    def cancel(self):
+        self.cancel_event.set()
@@ -0,0 +1,72 @@
+# src/voting.py
+from collections import deque
+
+EMPTY = "..."
+
+
+class MajorityVote:
+    """
+    Стабилизация предсказаний (Majority Voting) по последним maxlen кадрам.
+    Кадры с уверенностью не выше threshold голосуют за "...".
+    Счетчики ведутся по мере поступления голосов: метка -> число голосов
+    и число голосов -> метки (buckets), поэтому push() и leader() — O(1)
+    без пересчета окна. При равенстве голосов лидер не меняется.
+    """
+    def __init__(self, maxlen=10, threshold=0.65):
+        self.threshold = threshold
+        self.maxlen = maxlen
+        self.buffer = deque()
+        self.counts = {}
+        self._buckets = {}  # число голосов -> {метка: None} (упорядоченное множество)
+        self._top = 0
+        self._leader = EMPTY
+
+    def push(self, label, conf):
+        """Добавляет голос кадра и возвращает текущий лидер"""
+        self._append(label if conf > self.threshold else EMPTY)
+        return self.leader()
+
+    def push_empty(self):
+        """Кадр без рук"""
+        self._append(EMPTY)
+
+    def leader(self):
+        if self._top == 0:
+            return EMPTY
+        if self.counts.get(self._leader) != self._top:
+            self._leader = next(iter(self._buckets[self._top]))
+        return self._leader
+
+    def clear(self):
+        self.buffer.clear()
+        self.counts.clear()
+        self._buckets.clear()
+        self._top = 0
+        self._leader = EMPTY
+
+    def _append(self, label):
+        if len(self.buffer) >= self.maxlen:
+            self._dec(self.buffer.popleft())
+        self.buffer.append(label)
+        self._inc(label)
+
+    def _inc(self, label):
+        n = self.counts.get(label, 0)
+        if n:
+            del self._buckets[n][label]
+        self.counts[label] = n + 1
+        self._buckets.setdefault(n + 1, {})[label] = None
+        if n + 1 > self._top:
+            self._top = n + 1
+
+    def _dec(self, label):
+        n = self.counts[label]
+        bucket = self._buckets[n]
+        del bucket[label]
+        if not bucket and n == self._top:
+            self._top = n - 1
+        if n > 1:
+            self.counts[label] = n - 1
+            self._buckets.setdefault(n - 1, {})[label] = None
+        else:
+            del self.counts[label]